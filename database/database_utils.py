@@ -26,6 +26,9 @@ def create_and_init_database(db_path):
             data_insert = f.read()
         cursor.executescript(data_insert)
 
+        # Gather statistics about the tables and indexes after seeding so the query planner picks the right indexes
+        cursor.execute("ANALYZE")
+
         connection.commit()
         connection.close()
         print(f"New database created and initial data loaded at {db_path}")
@@ -42,6 +45,10 @@ def teardown_database(db_path):
         if os.path.exists(db_path):
             os.remove(db_path)
             print(f"Database at {db_path} removed.")
+        # WAL mode files that are left if a connection was not closed
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
     except OSError as e:
         print(f"Error removing database at {db_path}: {e}")
 
@@ -55,3 +55,8 @@ CREATE TABLE best_solutions (
     FOREIGN KEY (problem_instance_name) REFERENCES problem_instances (name),
     FOREIGN KEY (solution_id) REFERENCES all_solutions (id)
 );
+
+-- Index for the query that finds an active solution submission for an agent to validate (see get_solution_submission_id in 
+-- server_node.py) - the partial index only holds solution submissions still in the validation phase so it stays small, and it 
+-- covers all the columns the query reads so the filter and ORDER BY are served from the index without reading the table rows
+CREATE INDEX IF NOT EXISTS idx_all_solutions_poll ON all_solutions (problem_instance_name, submission_time, validation_end_time, agent_id, id, accepted) WHERE accepted IS NULL;
@@ -350,9 +350,11 @@ class AgentNode:
         """Submit a solution to the server node get solution submission id in response
         so that agent can track the status of the solution submission."""
         self.logger.info(f"Request to submit solution for problem instance {problem_instance_name}...")
-        response = httpx.post(f"http://{SERVER_NODE_HOST}:{SERVER_NODE_PORT}/solutions/submit/{problem_instance_name}", 
-                              json={"solution_data": solution_data, "objective_value": objective_value},
-                              headers=self.headers,
+        # The solution data is sent as the raw request body (not wrapped in JSON)
+        response = httpx.post(f"http://{SERVER_NODE_HOST}:{SERVER_NODE_PORT}/solutions/upload/{problem_instance_name}", 
+                              params={"objective_value": objective_value},
+                              content=solution_data.encode("utf-8"),
+                              headers={**self.headers, "Content-Type": "application/octet-stream"},
                               timeout=30.0)
         if response.status_code != 200:
             self.logger.error(f"Failed to submit solution for problem instance {problem_instance_name} - HTTP Error {response.status_code}: {response.text}")
@@ -4,7 +4,7 @@ Server node ...
 Design NOTE on programmed server node:
 - The server node is designed so that there can only be one instance of the server node running at a time (singleton pattern).
 - The server node has a SQLite database that stores relevant information for the platform (see ../database/schema.sql). A database manager 
-  object is used to manage database connections for multiple threads used for the solution validation phase.
+  object is used to manage database connections for multiple threads (web server threads and the solution validation phase scheduler thread).
 - The server node keeps track of the agent ids that are valid on the platform in a database table (agent_nodes). Agents need to register 
   with the server node to be able to participate in the platform.
 - The server node stores problem instances in local file storage and information about the instances in the database (problem_instances table)
@@ -38,9 +38,17 @@ import time
 from datetime import datetime, timedelta
 import uuid
 import logging
+import logging.handlers
+import queue
 import json
 import traceback
+import heapq
+import random
+from typing import Callable, Hashable, TypedDict
 from threading import local
+from collections import Counter, OrderedDict, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
 
 from database.database_utils import create_and_init_database, teardown_database
 from config import SERVER_NODE_HOST, SERVER_NODE_PORT, NETWORK_PARAMS_DIR, EXPERIMENT_DIR, EXPERIMENT_DATA_DIR
@@ -57,6 +65,75 @@ SUCCESSFUL_SOLUTION_SUBMISSION_REWARD = int(os.getenv("SUCCESSFUL_SOLUTION_SUBMI
 SOLUTION_VALIDATION_REWARD = int(os.getenv("SOLUTION_VALIDATION_REWARD"))  # reward for validating a solution
 RANDOM_PROBLEM_INSTANCE_POOL_SIZE =  int(os.getenv("RANDOM_PROBLEM_INSTANCE_POOL_SIZE"))   # number of problem instances to choose from when selecting a problem instance for an agent
 
+# SQL statements used by the server node (kept as constants so the SQLite statement cache can reuse them)
+_SQL_DEACTIVATE = "UPDATE problem_instances SET active = 0 WHERE name = ?"
+_SQL_INSERT_ALL_SOLUTIONS = """INSERT INTO all_solutions (id, agent_id, problem_instance_name, submission_time, validation_end_time, sol_file_path) 
+                               VALUES (?, ?, ?, ?, ?, ?)
+                            """
+_SQL_UPSERT_BEST_SOLUTION = """INSERT INTO best_solutions (problem_instance_name, solution_id, file_location) VALUES (?, ?, ?)
+                               ON CONFLICT(problem_instance_name) DO UPDATE SET solution_id = excluded.solution_id, file_location = excluded.file_location
+                            """
+_SQL_UPDATE_ALL_SOLUTIONS = """UPDATE all_solutions 
+                               SET reward_accumulated = ?, objective_value = ?, accepted = ?, active = FALSE, accepted_count = ?, rejected_count = ?, sol_file_path = NULL 
+                               WHERE id = ?
+                            """
+_SQL_UPDATE_PROBLEM_INSTANCE_REWARD = """UPDATE problem_instances
+                                         SET reward_accumulated = reward_accumulated + ?,
+                                             active = CASE WHEN reward_accumulated + ? >= reward_budget THEN 0 ELSE active END
+                                         WHERE name = ?
+                                         RETURNING reward_accumulated, reward_budget
+                                      """
+_SQL_DELETE_VALIDATIONS = "DELETE FROM active_solutions_submissions_validations WHERE solution_submission_id = ?"
+_SQL_INSERT_VALIDATION = """INSERT INTO active_solutions_submissions_validations 
+                                (solution_submission_id, problem_instance_name, agent_validated_id, validation_response, objective_value, reward) 
+                            VALUES 
+                                (?, ?, ?, ?, ?, ?)
+                         """
+_SQL_INSERT_AGENT = "INSERT INTO agent_nodes (id) VALUES (?)"
+_SQL_SELECT_SOLUTION_SUBMISSIONS_TO_VALIDATE = """SELECT id 
+                                                   FROM all_solutions
+                                                   WHERE problem_instance_name = ? 
+                                                       AND accepted IS NULL 
+                                                       AND agent_id != ?
+                                                       AND validation_end_time >= strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime', '+15 seconds')
+                                                   ORDER BY submission_time ASC
+                                                   LIMIT ?
+                                                """
+PROBLEM_INSTANCE_CACHE_SIZE = 32   # number of problem instance files kept in memory
+PROBLEM_INSTANCE_CACHE_BYTES = 256 * 1024 * 1024   # total size of the problem instance files kept in memory
+SOLUTION_FILE_CACHE_SIZE = 64   # number of (best) solution files kept in memory
+SOLUTION_FILE_CACHE_BYTES = 256 * 1024 * 1024   # total size of the (best) solution files kept in memory (solution files can be up to 64 MB)
+FILE_READ_LOCK_STRIPES = 16   # number of locks that concurrent reads of the same file are serialized on
+VALIDATION_WRITE_INTERVAL = 0.05   # seconds that registered validations are collected before they are written to the database together
+
+
+class SolutionSubmissionInfo(TypedDict):
+    """Information about an active solution submission that the server node needs to finalize its solution validation phase
+    (and to answer status requests for it)."""
+    problem_instance_name: str
+    agent_id: str   # id of the agent that submitted the solution
+    submission_time: str
+    validation_end_time: str
+    objective_value: float   # objective value of the solution submitted by the agent
+    validation_deadline: float   # time.monotonic() time when the validation phase ends
+    sol_file_path: str   # location of the solution data file in the temporary storage
+    accept_count: int   # number of agents that have accepted the solution
+    reject_count: int   # number of agents that have rejected the solution
+    accepted_objective_values: Counter[float]   # objective values calculated by the agents that accepted the solution
+    objective_values: Counter[float]   # objective values calculated by all agents that validated the solution
+    validation_reward: int   # reward given to the agents that validated the solution
+    validated_by: set[str]   # ids of the agents that validated the solution
+
+
+class CachedFile(TypedDict):
+    """A file kept in memory by a FileCache."""
+    location: str
+    identity: tuple[int, int, int]   # inode, modification time and size of the file the data was read from
+    data: str
+    # Response bodies built from the data (e.g. gzip compressed downloads) - key is the kind of body, value is 
+    # (what else the body depends on, body), so each body is only built once for each version of the file
+    derived_bodies: dict[str, tuple[Hashable, bytes]]
+
 
 ##--- ServerNode class ---##
 class ServerNode:
@@ -94,17 +171,13 @@ class ServerNode:
         SERVER_DATA_DIR = os.path.join(THIS_EXPERIMENT_DATA_DIR, "server_data_tmp")
         if os.path.exists(SERVER_DATA_DIR):
             shutil.rmtree(SERVER_DATA_DIR, onexc=ServerNode._remove_readonly)
-        os.makedirs(SERVER_DATA_DIR, exist_ok=False)
+        # NOTE: the subfolders are removed with the parent folder above so we only need to create them
         # Folder to store best soluttions on the platform
         self.best_solutions_dir = os.path.join(SERVER_DATA_DIR, "best_solutions")
-        if os.path.exists(self.best_solutions_dir):
-            shutil.rmtree(self.best_solutions_dir, onexc=ServerNode._remove_readonly)
-        os.makedirs(self.best_solutions_dir, exist_ok=False)
+        os.makedirs(self.best_solutions_dir, exist_ok=True)
         # Folder to store solution data of active solution submissions
         self.active_solutions_dir = os.path.join(SERVER_DATA_DIR, "active_solutions")
-        if os.path.exists(self.active_solutions_dir):
-            shutil.rmtree(self.active_solutions_dir, onexc=ServerNode._remove_readonly)
-        os.makedirs(self.active_solutions_dir, exist_ok=False)
+        os.makedirs(self.active_solutions_dir, exist_ok=True)
 
         # Database - create database manager object to manage database connections for multiple threads
         self.db_path = os.path.join(SERVER_DATA_DIR, "server_node.db")
@@ -112,8 +185,46 @@ class ServerNode:
         self.db_manager = DatabaseManager(self.db_path, self.logger)
         self.db_manager.get_connection(threading.get_ident())   # get a connection for the main thread
 
+        # Reward accumulated and reward budget of each problem instance - kept in memory so the validation phase scheduler can check 
+        # the reward budgets without querying the database (only the scheduler thread uses it after this)
+        results = self.query_db("SELECT name, description, active, reward_accumulated, reward_budget FROM problem_instances")
+        if results is None:
+            raise Exception("Error while querying database for the reward budgets of the problem instances")
+        self._problem_instance_rewards: dict[str, list[int]] = {
+            row["name"]: [row["reward_accumulated"] or 0, row["reward_budget"] or 0] for row in results
+        }
+        # Names and descriptions of the active problem instances - kept in memory so the pool of problem instances offered to the 
+        # agents is sampled without querying the database. The dict is never changed, only replaced (by the scheduler thread) when 
+        # a problem instance becomes inactive, so the web server threads can read it without a lock
+        self._active_problem_instances: dict[str, str] = {row["name"]: row["description"] for row in results if row["active"]}
+
         # Number of agents registered to the platform
         self.agent_counter = 0
+        self._agent_counter_lock = threading.Lock()   # agents can register concurrently from the web server worker threads
+        # Problem instance and best solution files kept in memory, so repeated downloads of the same file do not touch the disk 
+        # (a best solution file that has been replaced by a new best solution is read again) - the web server reads the files 
+        # through these caches
+        self.problem_instance_file_cache = FileCache(PROBLEM_INSTANCE_CACHE_SIZE, PROBLEM_INSTANCE_CACHE_BYTES)
+        self.best_solution_file_cache = FileCache(SOLUTION_FILE_CACHE_SIZE, SOLUTION_FILE_CACHE_BYTES)
+
+        # Solution validation phase - a single scheduler thread finalizes the active solution submissions in order of validation end time
+        self.active_solution_submissions: dict[str, SolutionSubmissionInfo] = dict()   # key is solution submission id
+        self._validation_deadlines: list[tuple[float, str]] = []   # heap of (monotonic validation deadline, solution submission id)
+        # Ids of the active solution submissions each agent has validated for a problem instance - key is (problem instance name, agent id)
+        self._validated_by: defaultdict[tuple[str, str], set[str]] = defaultdict(set)
+        self._scheduler_condition = threading.Condition()   # guards the three above and wakes up the scheduler thread
+        self._scheduler_stopped = False
+        # We use a daemon thread so that this thread does not continue to run after the main thread (server node server) has finished
+        self._scheduler_thread = threading.Thread(target=self._validation_scheduler_loop, daemon=True)
+        self._scheduler_thread.start()
+
+        # Registered validations waiting to be written to the database - a single writer thread inserts them in batches so that many
+        # concurrent validations share one transaction (the counts in active_solution_submissions are used to finalize the validation)
+        self._validation_write_queue: list[tuple] = []
+        self._validation_write_condition = threading.Condition()   # guards the two around it and wakes up the writer thread
+        self._validation_writer_stopped = False
+        self._validation_writer_thread = threading.Thread(target=self._validation_writer_loop, daemon=True)
+        self._validation_writer_thread.start()
 
 
     def __setup_experiment(self):
@@ -154,14 +265,21 @@ class ServerNode:
         """Set up the logger for the server node."""
         # Create or get the logger for the specific agent
         logger = logging.getLogger("Server node")
+        self._log_listener = None
         if not logger.hasHandlers():  # Avoid adding duplicate handlers
             # Create a file handler
             file_handler = logging.FileHandler(LOG_FILE_PATH, mode='a')
             file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+            # The logger only puts records on a queue and a listener thread writes them to the file, so the
+            # validation phase and the web server threads never block on file I/O when logging
+            log_queue = queue.Queue(-1)
+            self._log_listener = logging.handlers.QueueListener(log_queue, file_handler)
+            self._log_listener.start()
             
             # Set the logger's level
             logger.setLevel(logging.DEBUG)
-            logger.addHandler(file_handler)
+            logger.addHandler(logging.handlers.QueueHandler(log_queue))
 
         # Suppress HTTP-related debug logs globally
         logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -170,7 +288,7 @@ class ServerNode:
         return logger
 
 
-    def query_db(self, query: str, params: tuple=()) -> list[dict] | None:
+    def query_db(self, query: str, params: tuple=()) -> list[sqlite3.Row] | None:
         """Query the database and return the result.
         Returns: 
             list: The result of the query or None if an error occurred."""
@@ -183,13 +301,18 @@ class ServerNode:
         self.db_manager.execute_write(query, params, commit)
        
 
+    def transaction(self):
+        """Context manager for a database transaction - yields a cursor and commits all the queries at once on exit 
+        (or rolls back if an error occurred)."""
+        return self.db_manager.transaction()
+
+
     def __save_db(self):
         """Save the working database to the experiment folder for this run."""
         backup_db_path = f"{THIS_EXPERIMENT_DATA_DIR}/server_node.db"
         try:
-            with open(self.db_path, "rb") as f:
-                with open(backup_db_path, "wb") as f2:
-                    f2.write(f.read())
+            self.db_manager.checkpoint()
+            self.db_manager.backup(backup_db_path)
             self.logger.info(f"Database saved to {backup_db_path}")
         except Exception as e:
             self.logger.error(f"Error while saving database: {e}")
@@ -202,192 +325,273 @@ class ServerNode:
         Returns:
             str: The unique id of the agent | None: If an error occurred while registering the agent.
         """
-        self.agent_counter += 1
-        agent_id = "agent_" + str(self.agent_counter)
+        with self._agent_counter_lock:
+            self.agent_counter += 1
+            agent_id = "agent_" + str(self.agent_counter)
         try:
-            self.edit_data_in_db("INSERT INTO agent_nodes (id) VALUES (?)", (agent_id,))
+            self.edit_data_in_db(_SQL_INSERT_AGENT, (agent_id,))
             return agent_id
         except sqlite3.Error as e:
             self.logger.error(f"Error while registering agent {agent_id} to platform: {e}")
             return None
 
 
-    def get_pool_of_problem_instances(self) -> list[dict] | None:
-        """Get a pool of random active problem instances for an agent to choose from.
+    def get_pool_of_problem_instances(self) -> list[dict[str, str]]:
+        """Get a pool of random active problem instances for an agent to choose from (sampled from the active problem instances 
+        kept in memory).
+        Returns:
+            list: A list of dicts with the name and description of the problem instances.
+        """
+        active_problem_instances = list(self._active_problem_instances.items())
+        pool_size = min(RANDOM_PROBLEM_INSTANCE_POOL_SIZE, len(active_problem_instances))
+        return [
+            {"name": name, "description": description} 
+            for name, description in random.sample(active_problem_instances, pool_size)
+        ]
+
+
+    def is_problem_instance_active(self, problem_instance_name: str) -> bool | None:
+        """Check if a problem instance is active on the platform (from the problem instances kept in memory).
+        
         Returns:
-            list: A list of dictionaries with information about the problem instances or None if an error occurred.
+            bool: True if the problem instance is active, False otherwise | None: If the problem instance does not exist.
         """
-        return self.query_db("SELECT * FROM problem_instances WHERE active = TRUE ORDER BY RANDOM() LIMIT ?", (RANDOM_PROBLEM_INSTANCE_POOL_SIZE,))
+        if problem_instance_name not in self._problem_instance_rewards:
+            return None
+        return problem_instance_name in self._active_problem_instances
+
+
+    def _mark_problem_instance_inactive(self, problem_instance_name: str):
+        """Remove a problem instance from the active problem instances kept in memory (after it was made inactive in the database)."""
+        active_problem_instances = dict(self._active_problem_instances)
+        active_problem_instances.pop(problem_instance_name, None)
+        self._active_problem_instances = active_problem_instances
 
             
     def generate_solution_submission_id(self):
-        """Generate a unique id (for solution submissions)."""
-        return str(uuid.uuid4())
+        """Generate a unique id (for solution submissions) - 32 hex characters without dashes so the id is shorter to store, index and
+        hash, while it can still be used in URLs, file names and JSON."""
+        return uuid.uuid4().hex
 
 
-    def start_solution_validation_phase(self, problem_instance_name: str, solution_submission_id: str, agent_id: str, solution_data: str, objective_value: float):
+    def start_solution_validation_phase(self, problem_instance_name: str, solution_submission_id: str, agent_id: str, solution_data: str | bytes, objective_value: float) -> dict[str, str]:
         """Start the solution validation phase with a time limit for a solution submission.
         
         Args:
             problem_instance_name (str): The name of the problem instance.
             solution_submission_id (str): The unique id of the solution submission.
             agent_id (str): The id of the agent that submitted the solution.
-            solution_data (str): The solution data as a string.
+            solution_data (str | bytes): The solution data as a string (or as UTF-8 encoded bytes).
+        Returns:
+            dict: The submission_time and validation_end_time of the solution submission (as stored in the database).
         Raises:
             Exception: If an error occurs while starting the validation phase.
         """
-        submission_time = datetime.now()
-        validation_end_time = submission_time + timedelta(seconds=SOLUTION_VALIDATION_DURATION)
+        # Wall clock times are only stored in the database - they are formatted to strings once here (same format as the default
+        # sqlite3 datetime adapter, which is deprecated) and the scheduler uses a monotonic deadline (immune to wall clock changes)
+        submission_datetime = datetime.now()
+        submission_time = str(submission_datetime)
+        validation_end_time = str(submission_datetime + timedelta(seconds=SOLUTION_VALIDATION_DURATION))
+        validation_deadline = time.monotonic() + SOLUTION_VALIDATION_DURATION
 
         # Create a database entry for the solution submission
         try:
             sol_file_path = os.path.join(self.active_solutions_dir, f"{solution_submission_id}.sol")
             self.edit_data_in_db(
-                "INSERT INTO all_solutions (id, agent_id, problem_instance_name, submission_time, validation_end_time, sol_file_path) VALUES (?, ?, ?, ?, ?, ?)",
+                _SQL_INSERT_ALL_SOLUTIONS,
                 (solution_submission_id, agent_id, problem_instance_name, submission_time, validation_end_time, sol_file_path)
             )
         except sqlite3.Error as e:
             self.logger.error(f"Error while inserting solution submission {solution_submission_id} to database - Solution validation phase aborted: {e}")
             raise Exception(f"Error while inserting solution submission {solution_submission_id} to database - Solution validation phase aborted: {e}")
         
-        # Save the solution data to a file
+        # Save the solution data to a file - only the file path is kept in memory. The data is written to a temporary file that is 
+        # renamed when complete, so the solution file is never seen truncated (and the rename into the best solutions is atomic as well)
         try:
-            with open(sol_file_path, "w") as f:
-                f.write(solution_data)
+            sol_file_path_partial = f"{sol_file_path}.tmp"
+            with open(sol_file_path_partial, "wb") as f:
+                f.write(solution_data.encode("utf-8") if isinstance(solution_data, str) else solution_data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(sol_file_path_partial, sol_file_path)
         except Exception as e:
             self.logger.error(f"Error while saving tmp solution data to file {sol_file_path} - Solution validation phase aborted: {e}")
             raise Exception(f"Error while saving solution data to file {sol_file_path} - Solution validation phase aborted: {e}")
-        
-        def validation_thread_function():
-            try:
-                self.db_manager.get_connection(threading.get_ident(), solution_submission_id)
-                self._manage_validation_phase(problem_instance_name, solution_submission_id, validation_end_time, objective_value)
-            finally:
-                self.db_manager.close_connection(threading.get_ident(), solution_submission_id)
-        
-        # Start a background thread for this solution submission validation - we use daemon threads so that this thread does not continue to run after the main thread (server node server) has finished
-        validation_thread = threading.Thread(target=validation_thread_function, daemon=True)
-        validation_thread.start()
+
+        # Hand the solution submission over to the validation phase scheduler thread
+        with self._scheduler_condition:
+            self.active_solution_submissions[solution_submission_id] = SolutionSubmissionInfo(
+                problem_instance_name=problem_instance_name,
+                agent_id=agent_id,
+                submission_time=submission_time,
+                validation_end_time=validation_end_time,
+                objective_value=objective_value,
+                validation_deadline=validation_deadline,
+                sol_file_path=sol_file_path,
+                accept_count=0,
+                reject_count=0,
+                accepted_objective_values=Counter(),
+                objective_values=Counter(),
+                validation_reward=0,
+                validated_by=set()
+            )
+            heapq.heappush(self._validation_deadlines, (validation_deadline, solution_submission_id))
+            self._scheduler_condition.notify()
         self.logger.info(f"Started validation phase for solution submission {solution_submission_id} for problem instance {problem_instance_name}")
+        return {"submission_time": submission_time, "validation_end_time": validation_end_time}
 
 
-    def _manage_validation_phase(self, problem_instance_name: str, solution_submission_id: str, validation_end_time: datetime, objective_value: float):
-        """Manage the ongoing validation phase and end it after the time limit or if problem instance goes over budget."""
-        while datetime.now() < validation_end_time:
-            # The thread waits until the validation period expires - sleep for reasonable time since we are querying the database in the loop
-            time.sleep(int(SOLUTION_VALIDATION_DURATION/20))
-            #time.sleep(60)
-
-            # Check if the reward for the problem instance is finished - if so then we tag problem instance as inactive and stop the validation phase
-            results = self.query_db("SELECT reward_accumulated, reward_budget FROM problem_instances WHERE name = ?", (problem_instance_name,))
-            if results is None:
-                self.logger.error(f"Error while querying database for problem instance {problem_instance_name}")
-                continue
-            if not results:
-                self.logger.error(f"Problem instance {problem_instance_name} not found in database - SHOULD NOT HAPPEN")
-                continue
-            reward_accumulated =  results[0].get("reward_accumulated", 0)
-            reward_budget = results[0].get("reward_budget", 0)
-            if reward_accumulated and reward_budget:
-                # Get current reward accumulated for all solution submissions for this problem instance
-                results = self.query_db("SELECT SUM(reward) AS active_reward FROM active_solutions_submissions_validations WHERE problem_instance_name = ?", (problem_instance_name,))
-                if results is None:
-                    self.logger.error(f"Error while querying database for active solution submissions for problem instance {problem_instance_name}")
-                    continue
-                if not results:
-                    # No active solution submissions for this problem instance - continue to next iteration of the loop
-                    continue
-                active_reward = results[0]["active_reward"] or 0
-                # Compare accumulated reward for this problem instance with the budget
-                if reward_accumulated + active_reward >= reward_budget:
+    def _validation_scheduler_loop(self):
+        """Single background thread that manages the validation phase of all active solution submissions. It sleeps until the 
+        next validation end time (or the next check of the reward budgets) and then finalizes the solution submissions whose 
+        validation phase is over, or all active solution submissions for a problem instance that goes over its reward budget."""
+        budget_check_interval = max(1, int(SOLUTION_VALIDATION_DURATION/20))   # seconds (at least one so the scheduler never spins)
+        next_budget_check = time.monotonic() + budget_check_interval
+        while True:
+            try:
+                with self._scheduler_condition:
+                    # Wait until there is a solution submission to finalize or the reward budgets should be checked
+                    while not self._scheduler_stopped:
+                        now = time.monotonic()
+                        if not self.active_solution_submissions:
+                            next_budget_check = now + budget_check_interval
+                            self._scheduler_condition.wait()
+                            continue
+                        wake_up_time = next_budget_check
+                        if self._validation_deadlines:
+                            wake_up_time = min(wake_up_time, self._validation_deadlines[0][0])
+                        if wake_up_time <= now:
+                            break
+                        self._scheduler_condition.wait(timeout=wake_up_time - now)
+                    if self._scheduler_stopped:
+                        return
+
+                    # Collect the solution submissions whose validation phase is over
+                    now = time.monotonic()
+                    finished_submissions: list[tuple[str, SolutionSubmissionInfo]] = []
+                    while self._validation_deadlines and self._validation_deadlines[0][0] <= now:
+                        _, solution_submission_id = heapq.heappop(self._validation_deadlines)
+                        solution_submission = self.active_solution_submissions.pop(solution_submission_id, None)
+                        if solution_submission is not None:   # None if it was already finalized because the problem instance went over budget
+                            finished_submissions.append((solution_submission_id, solution_submission))
+                    problem_instance_names = set()
+                    if next_budget_check <= now:
+                        next_budget_check = now + budget_check_interval
+                        problem_instance_names = {submission["problem_instance_name"] for submission in self.active_solution_submissions.values()}
+
+                # Check if the reward for the problem instances is finished - if so then all active solution submissions for it are finalized now
+                # (an error here must not lose the solution submissions that were already collected above)
+                for problem_instance_name in problem_instance_names:
+                    try:
+                        if self._deactivate_if_over_budget(problem_instance_name):
+                            with self._scheduler_condition:
+                                for solution_submission_id, solution_submission in list(self.active_solution_submissions.items()):
+                                    if solution_submission["problem_instance_name"] == problem_instance_name:
+                                        del self.active_solution_submissions[solution_submission_id]
+                                        finished_submissions.append((solution_submission_id, solution_submission))
+                    except Exception as e:
+                        self.logger.error(f"Error while checking the reward budget for problem instance {problem_instance_name}: {e} {traceback.format_exc()}")
+
+                # Process final validation after the time limit - an error for one solution submission does not stop the others
+                for solution_submission_id, solution_submission in finished_submissions:
                     try:
-                        self.edit_data_in_db("UPDATE problem_instances SET active = False,  WHERE name = ?", (problem_instance_name,))
-                    except sqlite3.Error as e:
-                        # On error we just log the error and continue to next iteration of the loop - we will try again next time
-                        self.logger.error(f"Error while updating problem instance {problem_instance_name} to inactive in validation phase loop: {e}")
-                        continue
-                    self.logger.info((
-                        f"Budget for problem instance {problem_instance_name} is finished - the problem instance will not be available anymore "
-                        "all active solution submissions for this problem instance will be finalized soon"
-                    ))
-                    break
-
-        # Process final validation after the time limit 
-        self._finalize_validation(problem_instance_name, solution_submission_id, objective_value)
-           
-           
-    def _finalize_validation(self, problem_instance_name: str, solution_submission_id: str, objective_value: float):
+                        self._finalize_validation(solution_submission_id, solution_submission)
+                    except Exception as e:
+                        self.logger.error(f"Error while finalizing validation for solution submission {solution_submission_id}: {e} {traceback.format_exc()}")
+            except Exception as e:
+                # The scheduler is the only thread that finalizes solution submissions, so it keeps running after an error
+                self.logger.error(f"Error in validation phase scheduler: {e} {traceback.format_exc()}")
+
+
+    def _deactivate_if_over_budget(self, problem_instance_name: str) -> bool:
+        """Check if the reward budget for a problem instance is finished, counting also the rewards for validations of active
+        solution submissions, and if so tag the problem instance as inactive.
+        Returns:
+            bool: True if the problem instance was made inactive, False otherwise (also on error, then we try again next time).
+        """
+        rewards = self._problem_instance_rewards.get(problem_instance_name)
+        if rewards is None:
+            self.logger.error(f"Problem instance {problem_instance_name} not found - SHOULD NOT HAPPEN")
+            return False
+        reward_accumulated, reward_budget = rewards
+        if not (reward_accumulated and reward_budget):
+            return False
+        # Get current reward given for validations of the active solution submissions for this problem instance
+        with self._scheduler_condition:
+            active_reward = sum(
+                solution_submission["validation_reward"] for solution_submission in self.active_solution_submissions.values() 
+                if solution_submission["problem_instance_name"] == problem_instance_name
+            )
+        # Compare accumulated reward for this problem instance with the budget
+        if reward_accumulated + active_reward < reward_budget:
+            return False
+        try:
+            self.edit_data_in_db(_SQL_DEACTIVATE, (problem_instance_name,))
+        except sqlite3.Error as e:
+            # On error we just log the error - we will try again next time
+            self.logger.error(f"Error while updating problem instance {problem_instance_name} to inactive in validation phase scheduler: {e}")
+            return False
+        self._mark_problem_instance_inactive(problem_instance_name)
+        self.logger.info((
+            f"Budget for problem instance {problem_instance_name} is finished - the problem instance will not be available anymore "
+            "all active solution submissions for this problem instance will be finalized now"
+        ))
+        return True
+
+
+    def _finalize_validation(self, solution_submission_id: str, solution_submission: SolutionSubmissionInfo):
         """Finalize validation based on the collected results."""
+        problem_instance_name = solution_submission["problem_instance_name"]
         self.logger.info(f"Finalizing validation for solution submission {solution_submission_id} for problem instance {problem_instance_name}")
 
+        # The solution submission can not be validated anymore so the agents do not need to remember that they validated it
+        with self._scheduler_condition:
+            for agent_id in solution_submission["validated_by"]:
+                solution_submission_ids = self._validated_by.get((problem_instance_name, agent_id))
+                if solution_submission_ids is not None:
+                    solution_submission_ids.discard(solution_submission_id)
+                    if not solution_submission_ids:
+                        del self._validated_by[(problem_instance_name, agent_id)]
+
         try:
-            # Begin a database transaction so that we can do multiple operations in the database and commit them all at once
-            # NOTE: This is both for data consistency if one operation in this function fails then we decline the solution submission by default,
-            # and in the case that an agent is validating the solution at the same time as we are finalizing it
-            database_transactions = []
-        
-            # Retrieve collected validation results
-            results = self.query_db("SELECT * FROM active_solutions_submissions_validations WHERE solution_submission_id = ?", (solution_submission_id,))
-            if results is None:
-                self.logger.error(f"Error while querying database for solution submission {solution_submission_id}")
-                return
-            validations = [result["validation_response"] for result in results] if results else []
-            objective_values = [result["objective_value"] for result in results] if results else []
-            reward_accumulated = sum(result["reward"] for result in results) if results else 0
+            # Collected validation results (counted when the validations were registered) and the solution data file path
+            reward_accumulated = solution_submission["validation_reward"]
+            accepted_count = solution_submission["accept_count"]
+            rejected_count = solution_submission["reject_count"]
+            solution_file_location_tmp = solution_submission["sol_file_path"]
             
             # Determine the result of the validation phase
             # Check if there is only a single agent on the platform - then we accept the solution by default
             if self.agent_counter == 1:
-                objective_value = objective_value
+                objective_value = solution_submission["objective_value"]
                 accepted = True
                 accepted_count = 1
                 rejected_count = 0
             else:
                 objective_value = None
                 accepted = False
-                accepted_count = 0
-                rejected_count = 0
-                if validations and objective_values:
+                if accepted_count or rejected_count:
                     # Calculate final status based on validations, e.g. majority vote
-                    accepted_count = sum(validations)
-                    rejected_count = len(validations) - accepted_count
                     acceptance_ratio = accepted_count / (self.agent_counter - 1)   # NOTE: we don't count the agent that submitted the solution
                     if acceptance_ratio >= SOLUTION_VALIDATION_CONSENUS_RATIO:
                         accepted = True
 
                     # Use the most common objective value of the agents that accepted the solution as the objective value for this solution
-                    if objective_values:
-                        # Calculate the most common objective value for accepted solutions
-                        if accepted:
-                            accepted_objective_values = [objective_values[i] for i in range(len(validations)) if validations[i]]
-                            if accepted_objective_values:
-                                objective_value = max(set(accepted_objective_values), key=accepted_objective_values.count)
-                        # Or use the most common objective value for all validations if the solution was not accepted
-                        else:
-                            objective_value = max(set(objective_values), key=objective_values.count)
-
-            # Get the file path of the solution data
-            results = self.query_db("SELECT sol_file_path FROM all_solutions WHERE id = ?", (solution_submission_id,))
-            if results is None:
-                self.logger.error(f"Error while querying database for solution submission {solution_submission_id}")
-                return
-            solution_file_location_tmp = results[0]["sol_file_path"]
+                    if accepted:
+                        objective_value = solution_submission["accepted_objective_values"].most_common(1)[0][0]
+                    # Or use the most common objective value for all validations if the solution was not accepted
+                    else:
+                        objective_value = solution_submission["objective_values"].most_common(1)[0][0]
 
             # If the solution is valid then it should be the best solution so far 
             # NOTE: it is not guaranteed that it is the best solution but there is nothing that the server node should do about that since it is the agents decision!
             if accepted:
                 self.logger.info(f"Accepted solution submission for solution submission {solution_submission_id} for problem instance {problem_instance_name} with objective value {objective_value}")
-                # Save solution data to file storage with best solutions
-                try:
-                    with open(solution_file_location_tmp, "r") as f:
-                        solution_data = f.read()
-                except Exception as e:
-                    self.logger.error(f"Error while reading solution data from tmp file {solution_file_location_tmp}: {e}")
-                    return
+                # Move the solution data file to the file storage with best solutions - a rename on the same file system so the data
+                # is neither read nor copied (replaces the previous best solution file if it exists)
                 solution_file_location_best = f"{self.best_solutions_dir}/{problem_instance_name}.sol"
                 try:
-                    with open(solution_file_location_best, "w") as f:   # will create the file if it does not exist
-                        f.write(solution_data)
+                    os.replace(solution_file_location_tmp, solution_file_location_best)
                     self.logger.info(f"Best solution saved to file: {solution_file_location_best}")
                 except Exception as e:
                     self.logger.error(f"Error while saving best solution to file {solution_file_location_best}: {e}")
@@ -395,71 +599,53 @@ class ServerNode:
                 # "Give" reward to the agent who submitted the solution
                 reward_accumulated += SUCCESSFUL_SOLUTION_SUBMISSION_REWARD
 
-                # Update the best solution in the database (or insert if it does not exist)
-                try:
-                    database_transactions.append(("INSERT OR REPLACE INTO best_solutions (problem_instance_name, solution_id, file_location) VALUES (?, ?, ?)",
-                                                 (problem_instance_name, solution_submission_id, solution_file_location_best))
-                    )
-                except sqlite3.Error as e:
-                    self.logger.error(f"Error while updating best solution in database for problem instance {problem_instance_name}: {e}")
-
             else:
                 self.logger.info(f"Declined solution submission for solution submission {solution_submission_id} for problem instance {problem_instance_name} with objective value {objective_value}")
 
-            # Insert to db accumulated reward given for this solution submission, objective value, if it was accepted or not and remove the solution data file path
-            try:
-                database_transactions.append(("UPDATE all_solutions SET reward_accumulated = ?, objective_value = ?, accepted = ?, active = FALSE, accepted_count = ?, rejected_count = ?, sol_file_path = NULL WHERE id = ?",
-                                             (reward_accumulated, objective_value, accepted, accepted_count, rejected_count, solution_submission_id))
-                )
-            except sqlite3.Error as e:
-                self.logger.error(f"Error while updating solution submission {solution_submission_id} in database: {e}")
-
-            # Update the problem instance database table with the reward given for this solution submission
-            try:
-                database_transactions.append(("UPDATE problem_instances SET reward_accumulated = reward_accumulated + ? WHERE name = ?",
-                                             (reward_accumulated, problem_instance_name))
-                )
-            except sqlite3.Error as e:
-                self.logger.error(f"Error while updating problem instance {problem_instance_name} in database: {e}")
+            # Remove the solution data file from the temporary storage (if it was not moved to the best solutions)
+            if os.path.exists(solution_file_location_tmp):
+                try:
+                    os.remove(solution_file_location_tmp)
+                except Exception as e:
+                    self.logger.error(f"Error while removing tmp solution data file {solution_file_location_tmp}: {e}")
 
-            # If the reward is finished then we should make this problem instance inactive
-            results = self.query_db("SELECT reward_accumulated, reward_budget FROM problem_instances WHERE name = ?", (problem_instance_name,))
-            if results is None:
-                self.logger.error(f"Error while querying database for problem instance {problem_instance_name}")
-            else:
-                reward_accumulated = results[0]["reward_accumulated"]
-                reward_budget = results[0]["reward_budget"]
-                if reward_accumulated >= reward_budget:
-                    try:
-                        database_transactions.append(("UPDATE problem_instances SET active = False WHERE name = ?",
-                                                     (problem_instance_name,))
-                        )
-                    except sqlite3.Error as e:
-                        self.logger.error(f"Error while updating problem instance {problem_instance_name} to inactive in finalize validation phase: {e}")
-                    self.logger.info(f"Budget for problem instance {problem_instance_name} is finished - the problem instance will not be available anymore")
-
-            # Remove the solution data file from the temporary storage
-            try:
-                os.remove(solution_file_location_tmp)
-            except Exception as e:
-                self.logger.error(f"Error while removing tmp solution data file {solution_file_location_tmp}: {e}")
-            
-            # Clean up all rows in the active_solutions_submissions_validations table for this solution submission
+            # Write the results to the database in a single transaction so that we only commit once
+            # NOTE: This is both for data consistency if one operation in this function fails then we decline the solution submission by default,
+            # and in the case that an agent is validating the solution at the same time as we are finalizing it
+            # If no agent validated the solution submission (and no reward is given) then only the solution submission itself is updated
+            has_validations = bool(solution_submission["accept_count"] or solution_submission["reject_count"])
+            # Make sure all registered validations for the solution submission are in the database before they are cleaned up
+            if has_validations:
+                self._flush_validation_writes()
+            problem_instance_reward = None
             try:
-                database_transactions.append(("DELETE FROM active_solutions_submissions_validations WHERE solution_submission_id = ?",
-                                             (solution_submission_id,))
-                )
+                with self.transaction() as cursor:
+                    if accepted:
+                        # Update the best solution in the database (or insert if it does not exist)
+                        cursor.execute(_SQL_UPSERT_BEST_SOLUTION, (problem_instance_name, solution_submission_id, solution_file_location_best))
+                    # Insert to db accumulated reward given for this solution submission, objective value, if it was accepted or not and remove the solution data file path
+                    cursor.execute(_SQL_UPDATE_ALL_SOLUTIONS,
+                                   (reward_accumulated, objective_value, accepted, accepted_count, rejected_count, solution_submission_id))
+                    # Update the problem instance database table with the reward given for this solution submission, and if the reward
+                    # budget is finished then we make this problem instance inactive in the same statement (no need to read the reward back)
+                    if reward_accumulated:
+                        cursor.execute(_SQL_UPDATE_PROBLEM_INSTANCE_REWARD, (reward_accumulated, reward_accumulated, problem_instance_name))
+                        problem_instance_reward = cursor.fetchone()
+                        if problem_instance_reward is not None and problem_instance_reward["reward_accumulated"] >= problem_instance_reward["reward_budget"]:
+                            self.logger.info(f"Budget for problem instance {problem_instance_name} is finished - the problem instance will not be available anymore")
+                    # Clean up all rows in the active_solutions_submissions_validations table for this solution submission
+                    if has_validations:
+                        cursor.execute(_SQL_DELETE_VALIDATIONS, (solution_submission_id,))
+                # The transaction is committed so the rewards kept in memory can be updated
+                if problem_instance_reward is not None:
+                    self._problem_instance_rewards[problem_instance_name] = [problem_instance_reward["reward_accumulated"], problem_instance_reward["reward_budget"]]
+                    if problem_instance_reward["reward_accumulated"] >= problem_instance_reward["reward_budget"]:
+                        self._mark_problem_instance_inactive(problem_instance_name)
             except sqlite3.Error as e:
-                self.logger.error(f"Error while deleting validation results for solution submission {solution_submission_id}: {e}")
+                self.logger.error(f"Error while committing transactions for solution submission {solution_submission_id} for problem instance {problem_instance_name}: {e}")
 
             self.logger.info(f"Ended validation phase for solution submission {solution_submission_id} for problem instance {problem_instance_name}")
 
-            # Execute all database transactions
-            try:
-                self.db_manager.execute_transaction(database_transactions)
-            except sqlite3.Error as e:
-                self.logger.error(f"Error while committing transactions for solution submission {solution_submission_id} for problem instance {problem_instance_name}: {e}")
-
 
         except Exception as e:
             # If an error occurs while finalizing the validation then we should decline the solution by default and rollback the database transaction
@@ -471,8 +657,8 @@ class ServerNode:
                 self.logger.error(f"Error while updating solution submission {solution_submission_id} in database: {e}")
 
 
-     
-    def get_solution_submission_id(self, problem_instance_name: str, agent_id: str) -> list[dict] | None:
+
+    def get_solution_submission_id(self, problem_instance_name: str, agent_id: str) -> list[sqlite3.Row] | None:
         """Get an active solution submission with at least 15 seconds left for validation that this agent is 
         not the owner of and that the agent has not validated before.
         
@@ -482,32 +668,25 @@ class ServerNode:
         Returns:
             list: A list with the solution submission id or None if an error occurred.
         """
-        cutoff_time = datetime.now() + timedelta(seconds=15)
-        result = self.query_db(
-            """SELECT id 
-                FROM all_solutions 
-                WHERE problem_instance_name = ? 
-                    AND active IS TRUE 
-                    AND agent_id != ?
-                    AND validation_end_time >= ?
-                    AND id NOT IN (
-                        SELECT solution_submission_id
-                        FROM active_solutions_submissions_validations
-                        WHERE agent_validated_id = ?
-                    )
-                ORDER BY submission_time ASC LIMIT 1
-            """
-            , (problem_instance_name, agent_id, cutoff_time, agent_id)
-        )
+        # The solution submissions that the agent has already validated are skipped (kept in memory so the validations table 
+        # is not scanned) - at most all of them can be skipped, so the query only needs to return one row more than that
+        with self._scheduler_condition:
+            validated_solution_submission_ids = set(self._validated_by.get((problem_instance_name, agent_id), ()))
+        # The cutoff time is computed by SQLite (in the same local time format as the stored timestamps) once per query
+        result = self.query_db(_SQL_SELECT_SOLUTION_SUBMISSIONS_TO_VALIDATE, (problem_instance_name, agent_id, len(validated_solution_submission_ids) + 1))
         if result is None:
             self.logger.error(f"Error while querying database for solution submission for problem instance {problem_instance_name}")
             return None
-       
-        return result
+
+        for row in result:
+            if row["id"] not in validated_solution_submission_ids:
+                return [row]
+        return []
     
 
     def register_solution_validation(self, solution_submission_id: str, problem_instance_name: str, agent_id: str, validation_response: bool, objective_value: float):
-        """Register a validation of a solution submission from an agent to the database.
+        """Register a validation of a solution submission from an agent. The validation is counted right away and written to the
+        database by the validation writer thread.
         
         Args:
             solution_submission_id (str): The unique id of the solution submission.
@@ -515,22 +694,99 @@ class ServerNode:
             agent_id (str): The id of the agent that validated the solution.
             validation_response (bool): The response of the validation (True if accepted, False if declined).
             objective_value (float): The objective value of the solution.
-            reward (int): The reward given to the agent for validating the solution.
         Raises:
-            sqlite3.Error: If an error occurs while registering the validation.
+            Exception: If the validation phase of the solution submission is over or the agent has already validated it.
+        """
+        # Count the validation for the solution submission so the result is ready when the validation phase is finalized
+        with self._scheduler_condition:
+            if self._scheduler_stopped:
+                # The server node is stopping - the validation could be queued after the last write of the validations
+                self.logger.error(f"Validation for solution submission {solution_submission_id} for problem instance {problem_instance_name} registered after the server node was stopped")
+                raise Exception(f"Server node is stopped - validation for solution submission {solution_submission_id} for problem instance {problem_instance_name} is not registered")
+            solution_submission = self.active_solution_submissions.get(solution_submission_id)
+            if solution_submission is None:
+                # The validation phase is over (the validation would not be counted and its database entry would never be cleaned up)
+                self.logger.error(f"Validation for solution submission {solution_submission_id} for problem instance {problem_instance_name} registered after its validation phase ended")
+                raise Exception(f"Validation phase for solution submission {solution_submission_id} for problem instance {problem_instance_name} is over")
+            validated_solution_submission_ids = self._validated_by[(problem_instance_name, agent_id)]
+            if solution_submission_id in validated_solution_submission_ids:
+                self.logger.error(f"Agent {agent_id} has already validated solution submission {solution_submission_id} for problem instance {problem_instance_name}")
+                raise Exception(f"Agent {agent_id} has already validated solution submission {solution_submission_id} for problem instance {problem_instance_name}")
+            validated_solution_submission_ids.add(solution_submission_id)
+            solution_submission["validated_by"].add(agent_id)
+            if validation_response:
+                solution_submission["accept_count"] += 1
+                solution_submission["accepted_objective_values"][objective_value] += 1
+            else:
+                solution_submission["reject_count"] += 1
+            solution_submission["objective_values"][objective_value] += 1
+            solution_submission["validation_reward"] += SOLUTION_VALIDATION_REWARD
+
+            # Queue the validation for the database writer thread (while holding the scheduler lock so that the validation is queued 
+            # before the scheduler can finalize the solution submission and flush the queue)
+            with self._validation_write_condition:
+                self._validation_write_queue.append(
+                    (solution_submission_id, problem_instance_name, agent_id, validation_response, objective_value, SOLUTION_VALIDATION_REWARD)
+                )
+                self._validation_write_condition.notify()
+
+
+    def get_active_solution_submission(self, solution_submission_id: str) -> dict[str, str] | None:
+        """Get the owner, problem instance and times of a solution submission that is still in its validation phase.
+        
+        Returns:
+            dict: The agent_id, problem_instance_name, submission_time and validation_end_time of the solution submission or 
+            None if the solution submission is not active.
         """
+        with self._scheduler_condition:
+            solution_submission = self.active_solution_submissions.get(solution_submission_id)
+            if solution_submission is None:
+                return None
+            return {
+                "agent_id": solution_submission["agent_id"],
+                "problem_instance_name": solution_submission["problem_instance_name"],
+                "submission_time": solution_submission["submission_time"],
+                "validation_end_time": solution_submission["validation_end_time"]
+            }
+
+
+    def has_validated_solution_submission(self, solution_submission_id: str, problem_instance_name: str, agent_id: str) -> bool:
+        """Check if an agent has already validated an active solution submission."""
+        with self._scheduler_condition:
+            return solution_submission_id in self._validated_by.get((problem_instance_name, agent_id), ())
+
+
+    def _validation_writer_loop(self):
+        """Background thread that writes the registered validations to the database. It waits a short while after a validation
+        is registered so that the validations registered meanwhile are written in the same transaction."""
         try:
-            self.edit_data_in_db(
-            """INSERT INTO active_solutions_submissions_validations 
-                        (solution_submission_id, problem_instance_name, agent_validated_id, validation_response, objective_value, reward) 
-                    VALUES 
-                        (?, ?, ?, ?, ?, ?)
-                """
-                , (solution_submission_id, problem_instance_name, agent_id, validation_response, objective_value, SOLUTION_VALIDATION_REWARD)
-            )
+            while True:
+                with self._validation_write_condition:
+                    while not self._validation_write_queue and not self._validation_writer_stopped:
+                        self._validation_write_condition.wait()
+                    if self._validation_writer_stopped:
+                        return
+                time.sleep(VALIDATION_WRITE_INTERVAL)
+                self._flush_validation_writes()
+        except Exception as e:
+            self.logger.error(f"Error in validation writer - registered validations are only written when finalizing: {e} {traceback.format_exc()}")
+
+
+    def _flush_validation_writes(self):
+        """Write all queued validations to the database in a single transaction."""
+        validations = []
+        try:
+            # The queue is taken inside the write transaction so a flush that finds it empty has waited for any
+            # in-flight write of the validations that were taken before it (e.g. finalize deleting validations right after)
+            with self.transaction() as cursor:
+                with self._validation_write_condition:
+                    validations = self._validation_write_queue
+                    self._validation_write_queue = []
+                if validations:
+                    cursor.executemany(_SQL_INSERT_VALIDATION, validations)
         except sqlite3.Error as e:
-            self.logger.error(f"Error while registering validation for solution submission {solution_submission_id} for problem instance {problem_instance_name}: {e}")
-            raise sqlite3.Error(f"Error while registering validation for solution submission {solution_submission_id} for problem instance {problem_instance_name}: {e}")
+            # The validations are still counted for the solution submissions - only their database entries are lost
+            self.logger.error(f"Error while writing {len(validations)} validations to database: {e}")
 
 
     def get_solution_success_reward(self) -> int:
@@ -543,6 +799,21 @@ class ServerNode:
         return SOLUTION_VALIDATION_REWARD
 
 
+    def read_solution_submission_file(self, file_location: str) -> str:
+        """Read the solution file of an active solution submission from file storage. These files are only downloaded by
+        the agents validating the submission until its validation phase ends, so they are not cached and do not evict the best solutions.
+        
+        Args:
+            file_location (str): The location of the solution file.
+        Returns:
+            str: The solution data.
+        Raises:
+            OSError: If the file does not exist or could not be read.
+        """
+        with open(file_location, "r", encoding="utf-8") as file:
+            return file.read()
+
+
     @staticmethod
     def _remove_readonly(func, path, exc_info):
         """Remove the read-only flag from a file or directory so that it can be deleted."""
@@ -562,42 +833,106 @@ class ServerNode:
                 for result in results:
                     msg += f"\n{result["id"]}"
         self.logger.info(msg)
+        # Stop the validation phase scheduler - it finishes finalizing the solution submissions it is working on before it returns,
+        # so the database is only saved and torn down when it is not written to anymore (no need to sleep to let things settle)
+        with self._scheduler_condition:
+            self._scheduler_stopped = True
+            self._scheduler_condition.notify()
+        self._scheduler_thread.join(timeout=30)
+        if self._scheduler_thread.is_alive():
+            self.logger.error("Validation phase scheduler did not stop in time - saving the database anyway")
+        # Stop the validation writer and write the validations that are still queued
+        with self._validation_write_condition:
+            self._validation_writer_stopped = True
+            self._validation_write_condition.notify()
+        self._validation_writer_thread.join(timeout=10)
+        self._flush_validation_writes()
         # Save the database
         self.__save_db()
-        time.sleep(5)
+        # Disconnect from the database - the read connections first so the write connection is the last one to close, 
+        # which checkpoints the WAL file and removes the -wal and -shm files
+        self.db_manager.close_connection(threading.get_ident())
+        self.db_manager.close_read_connections()
+        self.db_manager.close_write_connection()
         # Teardown the database
         teardown_database(self.db_path)
-        # Disconnect from the database
-        self.db_manager.close_connection(threading.get_ident())
         # Delete the server node temporary data folders
         shutil.rmtree(self.best_solutions_dir, onexc=ServerNode._remove_readonly)
         shutil.rmtree(self.active_solutions_dir, onexc=ServerNode._remove_readonly)
         self.logger.info("Server node stopped")
+        # Flush the remaining log records to the log file
+        if self._log_listener is not None:
+            self._log_listener.stop()
 
 
 
 ##--- DatabaseManager class ---##
 class DatabaseManager:
-    """A class to manage SQLite database connections for multiple threads."""
+    """A class to manage SQLite database connections for multiple threads. Each thread reads with its own read-only connection
+    and all writes go through a single write connection, so writers wait on a lock in Python instead of retrying on a locked 
+    database, while the readers never wait for the writer (WAL)."""
     def __init__(self, db_path:str, logger: logging.Logger):
         self.db_path = db_path
         self.logger = logger
-        self.thread_local = local()   # stores connection for each thread
+        self.thread_local = local()   # stores read connection for each thread
+        # All open read connections by thread id, so the ones of the web server threadpool (which never close their own) 
+        # can be closed when the server node is stopped - otherwise the -wal and -shm files are left behind
+        self._read_connections: dict[int, sqlite3.Connection] = {}
+        self._read_connections_lock = threading.Lock()
+        self._write_lock = threading.RLock()   # serializes the writes and transactions on the write connection
+        # The write connection is opened right away so the database is in WAL mode before any read-only connection is opened
+        self._write_connection = self._connect(self.db_path, read_only=False)
+        self.logger.info(f"Connected to database at {self.db_path} for writing")
+
+
+    def _connect(self, db_path: str, read_only: bool) -> sqlite3.Connection:
+        """Open and configure a new SQLite connection."""
+        # NOTE: sqlite3 caches prepared statements per connection keyed by the SQL text, so queries with the same SQL string 
+        # are only parsed once - we make the cache bigger than the default (128) so the hot queries are never evicted
+        if read_only:
+            connection = sqlite3.connect(f"{Path(db_path).absolute().as_uri()}?mode=ro", uri=True, check_same_thread=False, cached_statements=512)
+        else:
+            connection = sqlite3.connect(db_path, check_same_thread=False, cached_statements=512)
+        connection.row_factory = sqlite3.Row   # rows can be accessed by column name
+        self._configure_connection(connection, read_only)
+        return connection
 
 
     def get_connection(self, thread_id, sumbission_id=None) -> sqlite3.Connection:
-        """Get or create a SQLite connection for the current thread."""
+        """Get or create a read-only SQLite connection for the current thread."""
         if not hasattr(self.thread_local, "connection"):
-            self.thread_local.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.thread_local.connection = self._connect(self.db_path, read_only=True)
+            with self._read_connections_lock:
+                self._read_connections[threading.get_ident()] = self.thread_local.connection
             if sumbission_id:
                 self.logger.info(f"Connected to database at {self.db_path} for thread {thread_id} for solution submission {sumbission_id}")
             else:
                 self.logger.info(f"Connected to database at {self.db_path} for thread {thread_id} (this is web server thread)")
         return self.thread_local.connection
     
+    def _configure_connection(self, connection: sqlite3.Connection, read_only: bool):
+        """Set the PRAGMAs for a new connection. WAL lets the web server threads read while the validation phase
+        threads write, and synchronous=NORMAL only syncs on WAL checkpoints instead of on every commit (still crash safe).
+        The busy timeout is set first so a connection waits for a writer instead of failing with "database is locked"."""
+        connection.execute("PRAGMA busy_timeout=5000")   # milliseconds
+        if read_only:
+            connection.execute("PRAGMA query_only=1")
+        else:
+            if self.db_path != ":memory:":   # in-memory databases can not use WAL
+                journal_mode = connection.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+                if journal_mode.lower() != "wal":
+                    self.logger.warning(f"Could not enable WAL mode for database at {self.db_path} - journal mode is {journal_mode}")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+        connection.execute("PRAGMA temp_store=MEMORY")
+        connection.execute("PRAGMA cache_size=-65536")   # ~64 MB page cache
+        connection.execute("PRAGMA mmap_size=268435456")   # 256 MB
+    
     def close_connection(self, thread_id, sumbission_id=None):
         """Close the SQLite connection for the current thread."""
         if hasattr(self.thread_local, "connection"):
+            with self._read_connections_lock:
+                self._read_connections.pop(threading.get_ident(), None)
             try:
                 self.thread_local.connection.close()
                 if sumbission_id:
@@ -608,49 +943,172 @@ class DatabaseManager:
             except sqlite3.Error as e:
                 self.logger.error(f"Error while disconnecting from database at {self.db_path} for thread {thread_id} for solution submission {sumbission_id}: {e}")
 
-    def execute_query(self, query: str, params: tuple=()) -> list[dict] | None:
-        """Execute a SELECT query and return the results as a list of dictionaries."""
+    def execute_query(self, query: str, params: tuple=()) -> list[sqlite3.Row] | None:
+        """Execute a SELECT query and return the results as a list of rows (sqlite3.Row, accessed by column name like a dictionary)."""
         connection = self.get_connection(-1)
         try:
             cursor = connection.cursor()
             cursor.execute(query, params)
             result = cursor.fetchall()
-            # Return a list of dictionaries with the column names as keys
-            columns = [description[0] for description in cursor.description]
-            result_dict = [dict(zip(columns, row)) for row in result]
             cursor.close()
-            return result_dict
+            return result
         except sqlite3.Error as e:
             self.logger.error(f"Error while querying database at {self.db_path}: {e}")
             return None
         
     def execute_write(self, query: str, params: tuple=(), commit: bool=True):
-        """Execute an INSERT, UPDATE, or DELETE query."""
-        connection = self.get_connection(-1)
-        try:
-            cursor = connection.cursor()
-            cursor.execute(query, params)
-            if commit:
-                connection.commit()
-            cursor.close()
-        except sqlite3.Error as e:
-            connection.rollback()
-            self.logger.error(f"Error while editing data in database at {self.db_path}: {e}")
-            raise sqlite3.Error(f"Error while editing data in database at {self.db_path}: {e}")
+        """Execute an INSERT, UPDATE, or DELETE query on the write connection."""
+        with self._write_lock:
+            connection = self._write_connection
+            try:
+                cursor = connection.cursor()
+                cursor.execute(query, params)
+                if commit:
+                    connection.commit()
+                cursor.close()
+            except sqlite3.Error as e:
+                connection.rollback()
+                self.logger.error(f"Error while editing data in database at {self.db_path}: {e}")
+                raise sqlite3.Error(f"Error while editing data in database at {self.db_path}: {e}")
         
-    def execute_transaction(self, operations: list[tuple[str, tuple]]):
+    @contextmanager
+    def transaction(self):
         """
-        Execute multiple queries as a transaction.
-        Args:
-            operations: List of tuples (query, params)
+        Execute multiple queries as a single transaction (one commit) on the write connection.
+        Yields:
+            sqlite3.Cursor: Cursor to execute the queries with
         """
-        connection = self.get_connection(-1)
+        with self._write_lock:
+            connection = self._write_connection
+            cursor = connection.cursor()
+            try:
+                if not connection.in_transaction:
+                    cursor.execute("BEGIN IMMEDIATE")   # take the write lock up front so the transaction never has to upgrade from a read
+                yield cursor
+                connection.commit()
+            except sqlite3.Error as e:
+                connection.rollback()
+                self.logger.error(f"Error while executing transaction at {self.db_path}: {e}")
+                raise sqlite3.Error(f"Error while executing transaction at {self.db_path}: {e}")
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def checkpoint(self):
+        """Move all the changes in the WAL file into the database file and truncate the WAL file (when the server node is stopped)."""
+        with self._write_lock:
+            self._write_connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def backup(self, backup_db_path: str):
+        """Copy the database to another database file with SQLite's online backup API. The copy is a consistent snapshot
+        (including changes that are still in the WAL file) and it is made in steps so that writers are not blocked meanwhile."""
+        backup_connection = sqlite3.connect(backup_db_path)
         try:
-            for query, params in operations:
-                cursor = connection.cursor()
-                cursor.execute(query, params)
-            connection.commit()
-        except sqlite3.Error as e:
-            connection.rollback()
-            self.logger.error(f"Error while executing transaction at {self.db_path}: {e}")
-            raise sqlite3.Error(f"Error while executing transaction at {self.db_path}: {e}")
+            with backup_connection:
+                self.get_connection(-1).backup(backup_connection, pages=1024, sleep=0.05)
+        finally:
+            backup_connection.close()
+
+    def close_read_connections(self):
+        """Close the read connections of all threads (when the server node is stopped)."""
+        with self._read_connections_lock:
+            read_connections = list(self._read_connections.items())
+            self._read_connections.clear()
+        for thread_id, connection in read_connections:
+            try:
+                connection.close()
+                self.logger.info(f"Disconnected from database at {self.db_path} for thread {thread_id}")
+            except sqlite3.Error as e:
+                self.logger.error(f"Error while disconnecting from database at {self.db_path} for thread {thread_id}: {e}")
+
+    def close_write_connection(self):
+        """Close the write connection (when the server node is stopped)."""
+        with self._write_lock:
+            try:
+                self._write_connection.close()
+                self.logger.info(f"Disconnected from database at {self.db_path} for writing")
+            except sqlite3.Error as e:
+                self.logger.error(f"Error while disconnecting from database at {self.db_path} for writing: {e}")
+
+
+
+##--- FileCache class ---##
+class FileCache:
+    """Files kept in memory in least recently used order, bounded both by the number of files and by their total size. A file
+    is read again when it has changed on disk (e.g. a best solution file replaced by a new best solution at the same location)."""
+    def __init__(self, max_files: int, max_bytes: int):
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self._files: OrderedDict[str, CachedFile] = OrderedDict()   # key is file location
+        self._bytes = 0   # total size of the cached files
+        self._lock = threading.Lock()   # guards the cached files (shared by the reads of all the lock stripes)
+        # Locks for the reads (picked by the hash of the file location) - when many agents download the same file that is not
+        # cached yet, only the first one reads it from disk and the others wait for it and then get the cached data
+        self._read_locks = [threading.Lock() for _ in range(FILE_READ_LOCK_STRIPES)]
+
+    def read(self, file_location: str) -> CachedFile:
+        """Read a file from the cache, or from file storage if it is not cached or has changed.
+        Raises:
+            OSError: If the file does not exist or could not be read (errors are not cached).
+        """
+        with self._read_locks[hash(file_location) % FILE_READ_LOCK_STRIPES]:
+            with open(file_location, "r", encoding="utf-8") as file:
+                # The identity is taken from the opened file, so the cached data always belongs to the file that would be read
+                # even if the file is replaced at the same location in the meantime
+                file_stat = os.fstat(file.fileno())
+                file_identity = (file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size)
+                with self._lock:
+                    cached_file = self._files.get(file_location)
+                    if cached_file is not None and cached_file["identity"] == file_identity:
+                        self._files.move_to_end(file_location)
+                        return cached_file
+                cached_file = CachedFile(location=file_location, identity=file_identity, data=file.read(), derived_bodies={})
+            self._put(cached_file)
+            return cached_file
+
+    def derived_body(self, cached_file: CachedFile, body_kind: str, dependency: Hashable, build_body: Callable[[], bytes]) -> bytes:
+        """Get a response body built from a cached file (e.g. a gzip compressed download). The body is kept next to the file 
+        and counts towards the size of the cache, so it is only built again when the file has changed or when what else the 
+        body depends on (e.g. the version of another file in the body) is different."""
+        with self._read_locks[hash(cached_file["location"]) % FILE_READ_LOCK_STRIPES]:   # the body is built only once
+            with self._lock:
+                derived = cached_file["derived_bodies"].get(body_kind)
+                if derived is not None and derived[0] == dependency:
+                    return derived[1]
+            body = build_body()
+            with self._lock:
+                # The body is only kept if the file is still cached (the file could have been evicted or replaced meanwhile)
+                if self._files.get(cached_file["location"]) is cached_file:
+                    replaced = cached_file["derived_bodies"].get(body_kind)
+                    if replaced is not None:
+                        self._bytes -= len(replaced[1])
+                    cached_file["derived_bodies"][body_kind] = (dependency, body)
+                    self._bytes += len(body)
+                    self._evict()
+            return body
+
+    def _put(self, cached_file: CachedFile):
+        """Put a file in the cache and evict the least recently used files when there are too many or they are too big."""
+        file_size = FileCache._size(cached_file)
+        if file_size > self.max_bytes:
+            return
+        with self._lock:
+            replaced = self._files.pop(cached_file["location"], None)   # older version of the file
+            if replaced is not None:
+                self._bytes -= FileCache._size(replaced)
+            self._files[cached_file["location"]] = cached_file
+            self._bytes += file_size
+            self._evict()
+
+    def _evict(self):
+        """Evict the least recently used files until the cache is within its bounds (called with the lock held)."""
+        while len(self._files) > self.max_files or self._bytes > self.max_bytes:
+            _, evicted = self._files.popitem(last=False)
+            self._bytes -= FileCache._size(evicted)
+
+    @staticmethod
+    def _size(cached_file: CachedFile) -> int:
+        """Size of a cached file in the cache - the file data and the response bodies built from it."""
+        return cached_file["identity"][2] + sum(len(body) for _, body in cached_file["derived_bodies"].values())
@@ -10,29 +10,101 @@ API documentation is available at /docs generated by Swagger UI.
 
 # To run as module from root folder: python -m network.server_node_server
 
-from fastapi import FastAPI, HTTPException, Header
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse, FileResponse, PlainTextResponse, Response
+from pydantic import BaseModel, Field
 import uvicorn
 import threading
 import os
-
-from .server_node import ServerNode
+import gzip
+import importlib.util
+from contextlib import asynccontextmanager
+from typing import Hashable
+import anyio.to_thread
+
+from .server_node import ServerNode, FileCache, CachedFile
+
+
+# SQL statements used by the routes - kept as module constants so each statement is always the same string and is found in 
+# the statement cache of the database connections (instead of being compiled again)
+_SQL_SELECT_AGENT = "SELECT id FROM agent_nodes WHERE id = ?"
+_SQL_SELECT_PROBLEM_INSTANCE_ACTIVE = "SELECT active FROM problem_instances WHERE name = ?"
+_SQL_SELECT_PROBLEM_INSTANCE_FILE = "SELECT active, file_location FROM problem_instances WHERE name = ?"
+_SQL_SELECT_PROBLEM_INSTANCE_DOWNLOAD = """SELECT pi.name, pi.description, pi.active, pi.file_location, bs.file_location AS solution_file_location
+                                            FROM problem_instances pi
+                                            LEFT JOIN best_solutions bs ON bs.problem_instance_name = pi.name
+                                            WHERE pi.name = ?
+                                        """
+_SQL_SELECT_BEST_SOLUTION_FILE = """SELECT pi.active, bs.file_location AS solution_file_location
+                                     FROM problem_instances pi
+                                     LEFT JOIN best_solutions bs ON bs.problem_instance_name = pi.name
+                                     WHERE pi.name = ?
+                                  """
+_SQL_SELECT_SOLUTION_SUBMISSION_STATUS = """SELECT agent_id, problem_instance_name, submission_time, validation_end_time, active, accepted 
+                                             FROM all_solutions WHERE id = ?
+                                          """
+_SQL_SELECT_SOLUTION_SUBMISSION_FILE = "SELECT sol_file_path FROM all_solutions WHERE id = ?"
+_SQL_SELECT_SOLUTION_SUBMISSION_VALIDATE = "SELECT id FROM all_solutions WHERE id = ?"
+
+# Number of worker threads that run the (blocking) route handlers - the default of 40 is raised so that many agents can be served 
+# at once (each worker thread has its own database connection)
+WEB_SERVER_THREADPOOL_SIZE = 64
+# Maximum length of the solution data in a solution submission - larger solutions are rejected by the request validation (422) 
+# before the route handler runs and the solution is written to file storage
+MAX_SOLUTION_DATA_LENGTH = 64 * 1024 * 1024
+# Download responses larger than this (bytes) are gzip compressed for clients that accept it - the problem instance and solution 
+# files are plain text and compress well, while small responses are not worth the extra CPU time
+GZIP_MINIMUM_SIZE = 1024
+GZIP_COMPRESS_LEVEL = 6
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Configure the web server when it starts (the threadpool can only be configured from the running event loop)."""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = WEB_SERVER_THREADPOOL_SIZE
+    yield
 
 
 # Create FastAPI application and put it in the server node class
 app = FastAPI(
     title="Distributed Optimization Solver API",
     description="""API endpoints offered by server node to the agent nodes as a part of the \
-    distributed optimization solver platform."""
+    distributed optimization solver platform.""",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse   # all responses are serialized with orjson instead of the standard json module
 )
 server_node = ServerNode(app)
 server = None
+server_thread = None
+
+
+@app.exception_handler(RequestValidationError)
+async def request_validation_exception_handler(request: Request, exc: RequestValidationError) -> ORJSONResponse:
+    """Same response as the default handler for invalid requests, except the invalid input is left out of the error details
+    (it could be a whole solution that was too large)."""
+    errors = [{key: value for key, value in error.items() if key != "input"} for error in exc.errors()]
+    return ORJSONResponse(status_code=422, content={"detail": jsonable_encoder(errors)})
+
+# uvicorn settings - uvloop event loop and httptools HTTP parser are faster than the pure Python defaults (uvloop is not available 
+# on Windows so we fall back to asyncio there). We run a single worker process since the server node keeps the state of the 
+# active solution submissions in memory
+UVICORN_SETTINGS = dict(
+    loop="uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+    http="httptools",
+    limit_concurrency=1000,
+    timeout_keep_alive=30,
+    access_log=False,
+    proxy_headers=False,   # the agents connect directly (no proxy) so the X-Forwarded-* headers are not parsed on every request
+    server_header=False,   # the Server and Date headers are not used by the agents and are left out of every response
+    date_header=False
+)
 
 def start_server():
     """Start the server using uvicorn's Server class."""
-    global server
+    global server, server_thread
     print("Server node web server started")
-    config = uvicorn.Config(app, host="0.0.0.0", port=server_node.port, log_level="info", access_log=False)
+    config = uvicorn.Config(app, host="0.0.0.0", port=server_node.port, log_level="info", **UVICORN_SETTINGS)
     server = uvicorn.Server(config)
     
     # Run the server in a separate thread
@@ -42,10 +114,16 @@ def start_server():
 
 def stop_server():
     """Stop the server gracefully."""
-    # Stop the server node
-    server_node.stop()
+    # Stop the web server first and wait for it to finish the requests in flight - the server node closes the database 
+    # connections of the worker threads when it is stopped, so no request may be handled after that
     if server and server.should_exit is False:
         server.should_exit = True
+    if server_thread is not None:
+        server_thread.join(timeout=30)
+        if server_thread.is_alive():
+            print("Server node web server did not stop in time - stopping the server node anyway")
+    # Stop the server node
+    server_node.stop()
     print("Server node web server stopped")
 
 
@@ -64,7 +142,7 @@ class ProblemInstanceStatusResponse(BaseModel):
     active: bool
 
 class SolutionSubmissionRequest(BaseModel):
-    solution_data: str
+    solution_data: str = Field(max_length=MAX_SOLUTION_DATA_LENGTH)
     objective_value: float
 
 class SolutionSubmissionResponse(BaseModel):
@@ -89,25 +167,49 @@ class SolutionValidationRequest(BaseModel):
 
 
 ##---- Routes for the server node server ---##
+# NOTE: the routes are plain functions (not async) since all their work is blocking (SQLite queries and file I/O) - FastAPI
+# runs them in its threadpool, so the event loop is never blocked and the requests are handled concurrently (each worker 
+# thread gets its own database connection)
+# NOTE: the routes return ORJSONResponse payloads directly (same schema as the response models) instead of building a pydantic 
+# model that FastAPI would then validate again against response_model - the problem and solution data can be large strings 
+# that would be gone over twice before they are serialized. The models are only kept in `responses` so the OpenAPI docs 
+# still show the schema
+
+def _download_response(response_class: type[Response], content, accept_encoding: str, file_cache: FileCache, cached_file: CachedFile, 
+                       body_kind: str, dependency: Hashable = None) -> Response:
+    """Build a download response from a cached file, gzip compressed for the agents that accept it. The compressed body is kept
+    in the file cache next to the file, so each version of the file is only compressed once (in the threadpool, not on the event 
+    loop) and then shared by all the agents downloading it."""
+    if "gzip" in accept_encoding and cached_file["identity"][2] >= GZIP_MINIMUM_SIZE:
+        body = file_cache.derived_body(
+            cached_file, body_kind, dependency, lambda: gzip.compress(response_class(content).body, compresslevel=GZIP_COMPRESS_LEVEL)
+        )
+        response = Response(body, media_type=response_class.media_type, headers={"Content-Encoding": "gzip"})
+    else:
+        response = response_class(content)
+    # The response depends on the Accept-Encoding header either way (for caches between the server node and the agents)
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
 
-@app.get("/register", response_model=AgentIDResponse)
-async def register_agent() -> AgentIDResponse:
+
+@app.get("/register", responses={200: {"model": AgentIDResponse}})
+def register_agent() -> ORJSONResponse:
     """Agent registers to the platform. Server node generates a unique id and returns it to 
     the agent that uses the id to identificate himself for all other API requests."""
     agent_id = server_node.register_agent_to_platform()
     if agent_id is None:
         raise HTTPException(status_code=500, detail="Could not register agent to the platform! Try again later.")
-    return AgentIDResponse(agent_id=agent_id)
+    return ORJSONResponse({"agent_id": agent_id})
 
 
-@app.get("/problem_instances/info", response_model=list[ProblemInstanceResponse])
-async def get_problem_instances_info(agent_id: str = Header(...)) -> list[ProblemInstanceResponse]:
+@app.get("/problem_instances/info", responses={200: {"model": list[ProblemInstanceResponse]}})
+def get_problem_instances_info(agent_id: str = Header(...)) -> ORJSONResponse:
     """Agent requests information about a pool of problem instances so he can download one (or more) 
     of them later using problem instance name. Returns a list of problem instances with their names and descriptions."""
     # Check if agent exists - we require the agent id to be sent in the header
     if not agent_id:
         raise HTTPException(status_code=400, detail="Agent ID not found in request header!")
-    results = server_node.query_db("SELECT * FROM agent_nodes WHERE id = ?", (agent_id,))
+    results = server_node.query_db(_SQL_SELECT_AGENT, (agent_id,))
     if results is None:
         # Database error
         raise HTTPException(status_code=500, detail="Database error")
@@ -115,30 +217,28 @@ async def get_problem_instances_info(agent_id: str = Header(...)) -> list[Proble
         # Agent not found
         raise HTTPException(status_code=404, detail="Agent ID not registered on the platform!")
     
-    # Get a pool of random problem instances from the server node database
+    # Get a pool of random active problem instances from the server node
     problem_instances = server_node.get_pool_of_problem_instances()
-    if problem_instances is None:
-        # Database error
-        raise HTTPException(status_code=500, detail="Database error")
     if not problem_instances:
         # No problem instances in the database
         raise HTTPException(status_code=404, detail="No problem instances available on the server node!")
     
-    return [ProblemInstanceResponse(
-        name=instance["name"],
-        description=instance["description"]
-
-    ) for instance in problem_instances]
+    # The rows are serialized directly with orjson (same schema as ProblemInstanceResponse) - no pydantic model is built for 
+    # each problem instance and the response is not validated again
+    return ORJSONResponse([
+        {"name": instance["name"], "description": instance["description"], "problem_data": None, "solution_data": None}
+        for instance in problem_instances
+    ])
 
 
-@app.get("/problem_instances/download/{problem_instance_name}", response_model=ProblemInstanceResponse)
-async def download_problem_instance_data_by_id(problem_instance_name: str, agent_id: str = Header(...)) -> ProblemInstanceResponse:
+@app.get("/problem_instances/download/{problem_instance_name}", responses={200: {"model": ProblemInstanceResponse}})
+def download_problem_instance_data_by_id(problem_instance_name: str, agent_id: str = Header(...), accept_encoding: str = Header("")) -> Response:
     """Agent requests a problem instance to download. Returns the problem instance data and best 
     solution on the platform if available."""
     # Check if agent exists - we require the agent id to be sent in the header
     if not agent_id:
         raise HTTPException(status_code=400, detail="Agent ID not found in request header!")
-    results = server_node.query_db("SELECT * FROM agent_nodes WHERE id = ?", (agent_id,))
+    results = server_node.query_db(_SQL_SELECT_AGENT, (agent_id,))
     if results is None:
         # Database error
         raise HTTPException(status_code=500, detail="Database error")
@@ -146,10 +246,8 @@ async def download_problem_instance_data_by_id(problem_instance_name: str, agent
         # Agent not found
         raise HTTPException(status_code=404, detail="Agent ID not registered on the platform!")
 
-    # Check if problem instance exists
-    result = server_node.query_db(
-        "SELECT * FROM problem_instances WHERE name = ?", (problem_instance_name,)
-    )
+    # Check if problem instance exists - and get where its best solution is stored in the same query
+    result = server_node.query_db(_SQL_SELECT_PROBLEM_INSTANCE_DOWNLOAD, (problem_instance_name,))
     if result is None:
         # Database error
         raise HTTPException(status_code=500, detail="Database error")
@@ -161,54 +259,90 @@ async def download_problem_instance_data_by_id(problem_instance_name: str, agent
         raise HTTPException(status_code=404, detail="Problem instance is not active!")
     problem_instance = result[0]
 
-    # Get problem instance data from file storage
-    problem_data = None
-    if os.path.exists(problem_instance["file_location"]):
+    # Get problem instance data from file storage (cached in memory by the server node)
+    try:
+        problem_file = server_node.problem_instance_file_cache.read(problem_instance["file_location"])
+    except FileNotFoundError:
+        # File not found
+        raise HTTPException(status_code=500, detail="File not found error")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="File read error")
+
+    # Get the solution data if it exists
+    solution_file = None
+    solution_location = problem_instance["solution_file_location"]
+    if solution_location is not None:
+        # Get problem instance solution from file storage (cached in memory by the server node)
         try:
-            with open(problem_instance["file_location"], "r") as file:
-                problem_data = file.read()
+            solution_file = server_node.best_solution_file_cache.read(solution_location)
+        except FileNotFoundError:
+            pass
         except Exception as e:
             raise HTTPException(status_code=500, detail="File read error")
-    if problem_data is None:
-        # File not found
-        raise HTTPException(status_code=500, detail="File not found error")
 
-    # Check where the solution is stored
-    result = server_node.query_db(
-        "SELECT file_location FROM best_solutions WHERE problem_instance_name = ?", (problem_instance["name"],)
-    )
+    # The compressed response is kept with the problem instance file for the current best solution version
+    return _download_response(ORJSONResponse, {
+        "name": problem_instance["name"],
+        "description": problem_instance["description"],
+        "problem_data": problem_file["data"],
+        "solution_data": solution_file["data"] if solution_file is not None else None
+    }, accept_encoding, server_node.problem_instance_file_cache, problem_file, "download", 
+        solution_file["identity"] if solution_file is not None else None)
+
+
+@app.get("/problem_instances/download/{problem_instance_name}/file", response_class=FileResponse)
+def download_problem_instance_file(problem_instance_name: str, agent_id: str = Header(...)) -> FileResponse:
+    """Agent requests the raw problem instance file to download (without the best solution). The file is streamed from 
+    file storage (with sendfile when the server supports it) instead of being read into memory and wrapped in JSON."""
+    # Check if agent exists - we require the agent id to be sent in the header
+    if not agent_id:
+        raise HTTPException(status_code=400, detail="Agent ID not found in request header!")
+    results = server_node.query_db(_SQL_SELECT_AGENT, (agent_id,))
+    if results is None:
+        # Database error
+        raise HTTPException(status_code=500, detail="Database error")
+    if not results:
+        # Agent not found
+        raise HTTPException(status_code=404, detail="Agent ID not registered on the platform!")
+
+    # Check if problem instance exists
+    result = server_node.query_db(_SQL_SELECT_PROBLEM_INSTANCE_FILE, (problem_instance_name,))
     if result is None:
         # Database error
         raise HTTPException(status_code=500, detail="Database error")
-    
-    # Get the solution data if it exists
-    solution_data = None
-    if result:
-        solution_location = result[0]["file_location"]
-        # Get problem instance solution from file storage
-        if os.path.exists(solution_location):
-            try:
-                with open(solution_location, "r") as file:
-                    solution_data = file.read()
-            except Exception as e:
-                raise HTTPException(status_code=500, detail="File read error")
-
-    return ProblemInstanceResponse(
-        name=problem_instance["name"],
-        description=problem_instance["description"],
-        problem_data=problem_data,
-        solution_data=solution_data
+    if not result:
+        # No problem instance found
+        raise HTTPException(status_code=404, detail="Problem instance not found!")
+    if result[0]["active"] == False:
+        # Problem instance is not active
+        raise HTTPException(status_code=404, detail="Problem instance is not active!")
+    file_location = result[0]["file_location"]
+
+    # The file is stated here (and the result passed on) so a missing file is reported before the response is started
+    try:
+        stat_result = os.stat(file_location)
+    except FileNotFoundError:
+        # File not found
+        raise HTTPException(status_code=500, detail="File not found error")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="File read error")
+
+    return FileResponse(
+        file_location, 
+        media_type="application/octet-stream", 
+        filename=os.path.basename(file_location), 
+        stat_result=stat_result
     )
 
 
-@app.get("/problem_instances/status/{problem_instance_name}", response_model=ProblemInstanceStatusResponse)
-def check_problem_instance_status(problem_instance_name: str, agent_id: str = Header(...)) -> ProblemInstanceStatusResponse:
+@app.get("/problem_instances/status/{problem_instance_name}", responses={200: {"model": ProblemInstanceStatusResponse}})
+def check_problem_instance_status(problem_instance_name: str, agent_id: str = Header(...)) -> ORJSONResponse:
     """Agent checks if the problem instance is active on the platform. Returns True if the problem instance is active,
     False otherwise."""
     # Check if agent exists - we require the agent id to be sent in the header
     if not agent_id:
         raise HTTPException(status_code=400, detail="Agent ID not found in request header!")
-    results = server_node.query_db("SELECT * FROM agent_nodes WHERE id = ?", (agent_id,))
+    results = server_node.query_db(_SQL_SELECT_AGENT, (agent_id,))
     if results is None:
         # Database error
         raise HTTPException(status_code=500, detail="Database error")
@@ -216,31 +350,52 @@ def check_problem_instance_status(problem_instance_name: str, agent_id: str = He
         # Agent not found
         raise HTTPException(status_code=404, detail="Agent ID not registered on the platform!")
     
-    # Search for the problem instance in the database
-    result = server_node.query_db(
-        "SELECT active FROM problem_instances WHERE name = ?", (problem_instance_name,)
-    )
-    if result is None:
-        # Database error
-        raise HTTPException(status_code=500, detail="Database error")
-    if not result:
+    # Look up the problem instance in the server node memory (without querying the database)
+    active = server_node.is_problem_instance_active(problem_instance_name)
+    if active is None:
         # No problem instance found
         raise HTTPException(status_code=404, detail="Problem instance not found!")
     
-    return ProblemInstanceStatusResponse(active=result[0]["active"])
+    return ORJSONResponse({"active": active})
 
 
-@app.post("/solutions/submit/{problem_instance_name}", response_model=SolutionSubmissionResponse)
-async def submit_solution(problem_instance_name: str, 
+@app.post("/solutions/submit/{problem_instance_name}", responses={200: {"model": SolutionSubmissionResponse}})
+def submit_solution(problem_instance_name: str, 
                           solution: SolutionSubmissionRequest, 
-                          agent_id: str = Header(...)) -> SolutionSubmissionResponse:
+                          agent_id: str = Header(...)) -> ORJSONResponse:
     """Agent submits a solution to a problem instance to the platform - the solution will be available for validation 
     by other agents for limited time to determine if the solution is best one on platform or not (agents need to reach 
     consensus). Returns some metadata about the solution submission and a soltuion submission id."""
+    return _submit_solution(problem_instance_name, agent_id, solution.solution_data, solution.objective_value)
+
+
+@app.post("/solutions/upload/{problem_instance_name}", responses={200: {"model": SolutionSubmissionResponse}})
+async def upload_solution(problem_instance_name: str, 
+                          objective_value: float, 
+                          request: Request, 
+                          agent_id: str = Header(...)) -> ORJSONResponse:
+    """Agent submits a solution to a problem instance to the platform (same as /solutions/submit) with the solution data sent 
+    as the raw request body (application/octet-stream) and the objective value as a query parameter. The solution data is 
+    written to file storage as it was received, without being decoded from JSON and validated as a string first."""
+    # Reject too large solutions before their body is read (if the agent sent the length of the body)
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > MAX_SOLUTION_DATA_LENGTH:
+        raise HTTPException(status_code=413, detail="Solution data is too large!")
+    solution_data = await request.body()
+    if len(solution_data) > MAX_SOLUTION_DATA_LENGTH:
+        raise HTTPException(status_code=413, detail="Solution data is too large!")
+    
+    # This route is async so it can read the body itself - the rest of the work (SQLite queries and file I/O) is blocking, so 
+    # it runs in the threadpool like the other routes
+    return await anyio.to_thread.run_sync(_submit_solution, problem_instance_name, agent_id, solution_data, objective_value)
+
+
+def _submit_solution(problem_instance_name: str, agent_id: str, solution_data: str | bytes, objective_value: float) -> ORJSONResponse:
+    """Start the solution validation phase for a solution submitted by an agent (shared by the two solution submission routes)."""
     # Check if agent exists - we require the agent id to be sent in the header
     if not agent_id:
         raise HTTPException(status_code=400, detail="Agent ID not found in request header!")
-    results = server_node.query_db("SELECT * FROM agent_nodes WHERE id = ?", (agent_id,))
+    results = server_node.query_db(_SQL_SELECT_AGENT, (agent_id,))
     if results is None:
         # Database error
         raise HTTPException(status_code=500, detail="Database error")
@@ -248,58 +403,50 @@ async def submit_solution(problem_instance_name: str,
         # Agent not found
         raise HTTPException(status_code=404, detail="Agent ID not registered on the platform!")
 
-    # Check if problem instance exists and is active
-    result = server_node.query_db(
-        "SELECT * FROM problem_instances WHERE name = ?", (problem_instance_name,)
-    )
-    if result is None:
-        # Database error
-        raise HTTPException(status_code=500, detail="Database error")
-    if not result:
+    # Check if problem instance exists and is active (from the server node memory)
+    active = server_node.is_problem_instance_active(problem_instance_name)
+    if active is None:
         # No problem instance found
         raise HTTPException(status_code=404, detail="Problem instance not found!")
-    problem_instance = result[0]
-    if problem_instance["active"] == False:
+    if not active:
         # Problem instance is not active
         raise HTTPException(status_code=404, detail="Problem instance is not active!")
     
-    # Start the solution validation phase (on different thread) for this solution submission
+    # Solution data sent as raw bytes must be text (the solution files are read as text when they are downloaded)
+    if isinstance(solution_data, bytes):
+        try:
+            solution_data.decode("utf-8")
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="Solution data is not UTF-8 encoded text!")
+
+    # Start the solution validation phase (on different thread) for this solution submission - the submission and validation 
+    # end times are returned so they don't have to be read back from the database
     solution_submission_id = server_node.generate_solution_submission_id()
     try:
-        server_node.start_solution_validation_phase(problem_instance_name, solution_submission_id, agent_id, solution.solution_data, solution.objective_value)
+        solution_submission = server_node.start_solution_validation_phase(problem_instance_name, solution_submission_id, agent_id, solution_data, objective_value)
     except Exception as e:
         raise HTTPException(status_code=500, detail="Could not start solution validation phase. Please try again later.")
-
-    # Get solution submission data from the database
-    result = server_node.query_db(
-        "SELECT * FROM all_solutions WHERE id = ?", (solution_submission_id,)
-    )
-    if result is None:
-        # Database error
-        raise HTTPException(status_code=500, detail="Database error")
-    if not result:
-        # Solution submission not found
-        raise HTTPException(status_code=404, detail="Solution submission id not found!")
-    solution_submission = result[0]
    
-    return SolutionSubmissionResponse(
-        solution_submission_id=solution_submission_id, 
-        problem_instance_name=problem_instance_name,
-        submission_time=solution_submission["submission_time"],
-        validation_end_time=solution_submission["validation_end_time"]
-    )
+    return ORJSONResponse({
+        "solution_submission_id": solution_submission_id, 
+        "problem_instance_name": problem_instance_name,
+        "submission_time": solution_submission["submission_time"],
+        "validation_end_time": solution_submission["validation_end_time"],
+        "accepted": None,
+        "reward": None
+    })
 
 
 # NOTE: a flaw with this is that agents can actually check solution submission status multiple times and "claim" the reward even though they don't get
 # any reward it is just for bookkeeping in this proof of concept so it does not matter
-@app.get("/solutions/submit/status/{solution_submission_id}", response_model=SolutionSubmissionResponse)
-async def get_solution_submission_status(solution_submission_id: str, agent_id: str = Header(...)) -> SolutionSubmissionResponse:
+@app.get("/solutions/submit/status/{solution_submission_id}", responses={200: {"model": SolutionSubmissionResponse}})
+def get_solution_submission_status(solution_submission_id: str, agent_id: str = Header(...)) -> ORJSONResponse:
     """Agent requests the status of a solution submission. Returns the status of the solution submission and
     the reward value (if the solution has been validated)."""    
     # Check if agent exists - we require the agent id to be sent in the header
     if not agent_id:
         raise HTTPException(status_code=400, detail="Agent ID not found in request header!")
-    results = server_node.query_db("SELECT * FROM agent_nodes WHERE id = ?", (agent_id,))
+    results = server_node.query_db(_SQL_SELECT_AGENT, (agent_id,))
     if results is None:
         # Database error
         raise HTTPException(status_code=500, detail="Database error")
@@ -307,10 +454,24 @@ async def get_solution_submission_status(solution_submission_id: str, agent_id:
         # Agent not found
         raise HTTPException(status_code=404, detail="Agent ID not registered on the platform!")
     
+    # Solution submissions that are still being validated are answered from the server node memory (without querying the database)
+    solution_submission = server_node.get_active_solution_submission(solution_submission_id)
+    if solution_submission is not None:
+        # Check if this solution submission belongs to the agent
+        if agent_id != solution_submission["agent_id"]:
+            # Agent does not own this solution submission
+            raise HTTPException(status_code=400, detail="Agent does not own this solution submission!")
+        return ORJSONResponse({
+            "solution_submission_id": solution_submission_id, 
+            "problem_instance_name": solution_submission["problem_instance_name"],
+            "submission_time": solution_submission["submission_time"],
+            "validation_end_time": solution_submission["validation_end_time"],
+            "accepted": None,
+            "reward": None
+        })
+
     # Check if solution submission exists
-    result = server_node.query_db(
-        "SELECT * FROM all_solutions WHERE id = ?", (solution_submission_id,)
-    )
+    result = server_node.query_db(_SQL_SELECT_SOLUTION_SUBMISSION_STATUS, (solution_submission_id,))
     if result is None:
         # Database error
         raise HTTPException(status_code=500, detail="Database error")
@@ -327,36 +488,57 @@ async def get_solution_submission_status(solution_submission_id: str, agent_id:
     # Check if solution submission is active
     if solution_submission["active"]:
         # Solution submission is still being validated
-        return SolutionSubmissionResponse(
-            solution_submission_id=solution_submission_id, 
-            problem_instance_name=solution_submission["problem_instance_name"],
-            submission_time=solution_submission["submission_time"],
-            validation_end_time=solution_submission["validation_end_time"]
-        )
+        return ORJSONResponse({
+            "solution_submission_id": solution_submission_id, 
+            "problem_instance_name": solution_submission["problem_instance_name"],
+            "submission_time": solution_submission["submission_time"],
+            "validation_end_time": solution_submission["validation_end_time"],
+            "accepted": None,
+            "reward": None
+        })
     else:
         # Solution submission has been validated
         if solution_submission["accepted"]:
             reward = server_node.get_solution_success_reward()
         else:
             reward = 0
-        return SolutionSubmissionResponse(
-            solution_submission_id=solution_submission_id, 
-            problem_instance_name=solution_submission["problem_instance_name"],
-            submission_time=solution_submission["submission_time"],
-            validation_end_time=solution_submission["validation_end_time"],
-            accepted=solution_submission["accepted"],
-            reward=reward
-        )
+        return ORJSONResponse({
+            "solution_submission_id": solution_submission_id, 
+            "problem_instance_name": solution_submission["problem_instance_name"],
+            "submission_time": solution_submission["submission_time"],
+            "validation_end_time": solution_submission["validation_end_time"],
+            "accepted": None if solution_submission["accepted"] is None else bool(solution_submission["accepted"]),
+            "reward": reward
+        })
     
 
-@app.get("/solutions/best/download/{problem_instance_name}", response_model=SolutionDataResponse)
-async def download_best_solution_by_id(problem_instance_name: str, agent_id: str = Header(...)):
+@app.get("/solutions/best/download/{problem_instance_name}", responses={200: {"model": SolutionDataResponse}})
+def download_best_solution_by_id(problem_instance_name: str, agent_id: str = Header(...), accept_encoding: str = Header("")) -> Response:
     """Agent requests to download the best solution for a specific problem instance. 
     Returns the best solution data if available."""
+    solution_file = _read_best_solution(problem_instance_name, agent_id)
+    return _download_response(ORJSONResponse, {
+        "solution_submission_id": None,
+        "problem_instance_name": problem_instance_name,
+        "solution_data": solution_file["data"]
+    }, accept_encoding, server_node.best_solution_file_cache, solution_file, "download", problem_instance_name)
+
+
+@app.get("/solutions/best/download/{problem_instance_name}/file", response_class=PlainTextResponse)
+def download_best_solution_file(problem_instance_name: str, agent_id: str = Header(...), accept_encoding: str = Header("")) -> Response:
+    """Agent requests the raw best solution file for a specific problem instance (the solution data as plain text instead of 
+    wrapped in JSON). The best solution file can be replaced by a new best solution at any time, so it is served from the 
+    server node memory (cached per file version) rather than streamed from file storage."""
+    solution_file = _read_best_solution(problem_instance_name, agent_id)
+    return _download_response(PlainTextResponse, solution_file["data"], accept_encoding, server_node.best_solution_file_cache, solution_file, "file")
+
+
+def _read_best_solution(problem_instance_name: str, agent_id: str) -> CachedFile:
+    """Get the best solution file for a problem instance (shared by the two best solution download routes)."""
     # Check if agent exists - we require the agent id to be sent in the header
     if not agent_id:
         raise HTTPException(status_code=400, detail="Agent ID not found in request header!")
-    results = server_node.query_db("SELECT * FROM agent_nodes WHERE id = ?", (agent_id,))
+    results = server_node.query_db(_SQL_SELECT_AGENT, (agent_id,))
     if results is None:
         # Database error
         raise HTTPException(status_code=500, detail="Database error")
@@ -364,10 +546,8 @@ async def download_best_solution_by_id(problem_instance_name: str, agent_id: str
         # Agent not found
         raise HTTPException(status_code=404, detail="Agent ID not registered on the platform!")
 
-    # Check if problem instance exists
-    result = server_node.query_db(
-        "SELECT * FROM problem_instances WHERE name = ?", (problem_instance_name,)
-    )
+    # Check if problem instance exists - and get the best solution for the problem instance in the same query
+    result = server_node.query_db(_SQL_SELECT_BEST_SOLUTION_FILE, (problem_instance_name,))
     if result is None:
         # Database error
         raise HTTPException(status_code=500, detail="Database error")
@@ -377,44 +557,29 @@ async def download_best_solution_by_id(problem_instance_name: str, agent_id: str
     if result[0]["active"] == False:
         # Problem instance is not active
         raise HTTPException(status_code=404, detail="Problem instance is not active!")
-    
-    # Get the best solution for the problem instance
-    result = server_node.query_db(
-        "SELECT file_location FROM best_solutions WHERE problem_instance_name = ?", (problem_instance_name,)
-    )
-    if result is None:
-        # Database error
-        raise HTTPException(status_code=500, detail="Database error")
-    if not result:
+    if result[0]["solution_file_location"] is None:
         # No best solution found
         raise HTTPException(status_code=404, detail="No best solution found for the problem instance!")
-    best_solution_location = result[0]["file_location"]
+    best_solution_location = result[0]["solution_file_location"]
 
-    # Get best solution data from file storage
-    if os.path.exists(best_solution_location):
-        try:
-            with open(best_solution_location, "r") as file:
-                best_solution_data = file.read()
-        except Exception as e:
-            raise HTTPException(status_code=500, detail="File read error")
-    else:
+    # Get best solution data from file storage (cached in memory by the server node)
+    try:
+        return server_node.best_solution_file_cache.read(best_solution_location)
+    except FileNotFoundError:
         # File not found
         raise HTTPException(status_code=404, detail="File containing best solution not found!")
-    
-    return SolutionDataResponse(
-        problem_instance_name=problem_instance_name,
-        solution_data=best_solution_data
-    )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="File read error")
 
 
-@app.get("/solutions/validate/download/{problem_instance_name}", response_model=SolutionDataResponse)
-async def download_solution_validate_by_id(problem_instance_name: str, agent_id: str = Header(...)):
+@app.get("/solutions/validate/download/{problem_instance_name}", responses={200: {"model": SolutionDataResponse}})
+def download_solution_validate_by_id(problem_instance_name: str, agent_id: str = Header(...)) -> ORJSONResponse:
     """Agent requests to download a solution to a specific problem instance (to validate it).
     Returns the oldest active solution submission that has more than 30 seconds left for validation."""
     # Check if agent exists - we require the agent id to be sent in the header
     if not agent_id:
         raise HTTPException(status_code=400, detail="Agent ID not found in request header!")
-    results = server_node.query_db("SELECT * FROM agent_nodes WHERE id = ?", (agent_id,))
+    results = server_node.query_db(_SQL_SELECT_AGENT, (agent_id,))
     if results is None:
         # Database error
         raise HTTPException(status_code=500, detail="Database error")
@@ -423,9 +588,7 @@ async def download_solution_validate_by_id(problem_instance_name: str, agent_id:
         raise HTTPException(status_code=404, detail="Agent ID not registered on the platform!")
     
     # Check if problem instance exists
-    result = server_node.query_db(
-        "SELECT * FROM problem_instances WHERE name = ?", (problem_instance_name,)
-    )
+    result = server_node.query_db(_SQL_SELECT_PROBLEM_INSTANCE_ACTIVE, (problem_instance_name,))
     if result is None:
         # Database error
         raise HTTPException(status_code=500, detail="Database error")
@@ -447,43 +610,42 @@ async def download_solution_validate_by_id(problem_instance_name: str, agent_id:
     solution_submission_id = result[0]["id"]
 
     # Get solution data from file storage
-    result = server_node.query_db(
-        "SELECT sol_file_path FROM all_solutions WHERE id = ?", (solution_submission_id,)
-    )
+    result = server_node.query_db(_SQL_SELECT_SOLUTION_SUBMISSION_FILE, (solution_submission_id,))
     if result is None:
         # Database error
         raise HTTPException(status_code=500, detail="Database error")
-    if not result or not result[0].get("sol_file_path"):
+    if not result or not result[0]["sol_file_path"]:
         # Solution submission not found
         raise HTTPException(status_code=404, detail="Solution submission not found!")
     solution_file_path = result[0]["sol_file_path"]
-    if os.path.exists(solution_file_path):
-        try:
-            with open(solution_file_path, "r") as file:
-                solution_data = file.read()
-        except Exception as e:
-            raise HTTPException(status_code=500, detail="File read error")
-    else:
+    # Read the solution file (not cached - only the best solutions are) - a missing file is detected by the read itself 
+    # instead of a separate existence check
+    try:
+        solution_data = server_node.read_solution_submission_file(solution_file_path)
+    except FileNotFoundError:
         # File not found
         raise HTTPException(status_code=404, detail="Solution data file not found!")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="File read error")
 
-    return SolutionDataResponse(
-        problem_instance_name=problem_instance_name,
-        solution_submission_id=solution_submission_id,
-        solution_data=solution_data
-    )
+    # Not compressed - the solution submission files are not cached, so the body would be compressed again for every download
+    return ORJSONResponse({
+        "solution_submission_id": solution_submission_id,
+        "problem_instance_name": problem_instance_name,
+        "solution_data": solution_data
+    })
 
 
-@app.post("/solutions/validate/{solution_submission_id}", response_model=SolutionValidationResponse)
-async def validate_solution_submission(solution_submission_id: str, 
+@app.post("/solutions/validate/{solution_submission_id}", responses={200: {"model": SolutionValidationResponse}})
+def validate_solution_submission(solution_submission_id: str, 
                             solution_validation_result: SolutionValidationRequest,
-                            agent_id: str = Header(...)) -> SolutionValidationResponse:
+                            agent_id: str = Header(...)) -> ORJSONResponse:
     """Agent sends solution validation result to server node for a specific solution submission. 
     Returns the reward for the agent who validated the solution."""
     # Check if agent exists - we require the agent id to be sent in the header
     if not agent_id:
         raise HTTPException(status_code=400, detail="Agent ID not found in request header!")
-    results = server_node.query_db("SELECT * FROM agent_nodes WHERE id = ?", (agent_id,))
+    results = server_node.query_db(_SQL_SELECT_AGENT, (agent_id,))
     if results is None:
         # Database error
         raise HTTPException(status_code=500, detail="Database error")
@@ -491,35 +653,23 @@ async def validate_solution_submission(solution_submission_id: str,
         # Agent not found
         raise HTTPException(status_code=404, detail="Agent ID not registered on the platform!")
         
-    # Check if the solution submission exists
-    result = server_node.query_db(
-        "SELECT * FROM all_solutions WHERE id = ?", (solution_submission_id,)
-    )
-    if result is None:
-        # Database error
-        raise HTTPException(status_code=500, detail="Database error")
-    if not result:
-        # Solution submission not found
-        raise HTTPException(status_code=404, detail="Solution submission id not found!")
-    solution_submission = result[0]
-
-    # Check if solution submission has already been validated
-    if not solution_submission["active"]:
+    # Get the solution submission from the server node memory (only solution submissions in their validation phase are kept there)
+    solution_submission = server_node.get_active_solution_submission(solution_submission_id)
+    if solution_submission is None:
+        # The database is only queried to tell an unknown solution submission from one that has already been validated
+        result = server_node.query_db(_SQL_SELECT_SOLUTION_SUBMISSION_VALIDATE, (solution_submission_id,))
+        if result is None:
+            # Database error
+            raise HTTPException(status_code=500, detail="Database error")
+        if not result:
+            # Solution submission not found
+            raise HTTPException(status_code=404, detail="Solution submission id not found!")
         # Solution submission is already validated
         raise HTTPException(status_code=400, detail="Solution submission has already been validated by the platform!")
     
-    # Check if the problem instance is active
+    # Check if the problem instance is active (from the server node memory)
     problem_instance_name = solution_submission["problem_instance_name"]
-    result = server_node.query_db(
-        "SELECT active FROM problem_instances WHERE name = ?", (problem_instance_name,)
-    )
-    if result is None:
-        # Database error
-        raise HTTPException(status_code=500, detail="Database error")
-    if not result:
-        # No problem instance found
-        raise HTTPException(status_code=404, detail="Problem instance not found!")
-    if result[0]["active"] == False:
+    if not server_node.is_problem_instance_active(problem_instance_name):
         # Problem instance is not active
         raise HTTPException(status_code=404, detail="Problem instance is not active!")
     
@@ -529,16 +679,7 @@ async def validate_solution_submission(solution_submission_id: str,
         raise HTTPException(status_code=400, detail="Agent cannot validate his own solution submission!")
         
     # Check if this agent has already validated this solution submission
-    solution_submission_id = solution_submission["id"]
-    result = server_node.query_db(
-        "SELECT * FROM active_solutions_submissions_validations WHERE solution_submission_id = ? AND agent_validated_id = ?", 
-        (solution_submission_id, agent_id)
-    )
-    if result is None:
-        # Database error
-        server_node.logger.debug("Database error")
-        raise HTTPException(status_code=500, detail="Database error")
-    if result:
+    if server_node.has_validated_solution_submission(solution_submission_id, problem_instance_name, agent_id):
         # Agent has already validated this solution submission
         raise HTTPException(status_code=400, detail="Agent has already validated this solution submission!")
         
@@ -548,13 +689,13 @@ async def validate_solution_submission(solution_submission_id: str,
     except Exception as e:
         raise HTTPException(status_code=500, detail="Database error")
 
-    return SolutionValidationResponse(reward=server_node.get_solution_validation_reward())
+    return ORJSONResponse({"reward": server_node.get_solution_validation_reward()})
     
     
 
 if __name__ == "__main__":
     try:
-        uvicorn.run(app, host="0.0.0.0", port=server_node.port, access_log=False)
+        uvicorn.run(app, host="0.0.0.0", port=server_node.port, **UVICORN_SETTINGS)
     except KeyboardInterrupt:
         pass
     finally: